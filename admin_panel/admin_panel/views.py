@@ -1,8 +1,8 @@
 from django.http import JsonResponse
 from django.db import connections
 from django.db.utils import OperationalError
-import redis
-import os
+
+from bot.redis_client import get_redis
 
 def healthcheck(request):
     checks = {}
@@ -14,14 +14,9 @@ def healthcheck(request):
     except OperationalError:
         checks['db'] = 'error'
 
-    # Redis check
+    # Redis check: клиент с пулом общий для всех запросов, соединение не открывается заново
+    r = get_redis()
     try:
-        r = redis.Redis(
-            host=os.getenv("REDIS_HOST", "redis"),
-            port=int(os.getenv("REDIS_PORT", 6379)),
-            password=os.getenv("REDIS_PASSWORD", None),
-            decode_responses=True
-        )
         r.ping()
         checks['redis'] = 'ok'
     except Exception:
@@ -20,11 +20,15 @@ class UsersAdmin(admin.ModelAdmin):
         'status_badge', 
         'tariff_badge',
         'total_posts',
+        'active_posts',
         'created_at'
     ]
     list_filter = ['user_status', 'user_tariff', 'language', 'created_at']
     search_fields = ['user_id', 'user_name', 'name', 'phone_number']
-    readonly_fields = ['user_id', 'created_at', 'updated_at']
+    readonly_fields = [
+        'user_id', 'created_at', 'updated_at', 'last_delivery_at',
+        'total_posts', 'active_posts', 'deleted_posts', 'last_published_at'
+    ]
     list_per_page = 50
     
     fieldsets = (
@@ -35,7 +39,7 @@ class UsersAdmin(admin.ModelAdmin):
             'fields': ('language', 'user_status', 'user_tariff')
         }),
         ('Статистика', {
-            'fields': ('total_posts',)
+            'fields': ('total_posts', 'active_posts', 'deleted_posts', 'last_published_at', 'last_delivery_at')
         }),
         ('Заметки', {
             'fields': ('notes',),
@@ -110,7 +114,10 @@ class UserPostsAdmin(admin.ModelAdmin):
     ]
     list_filter = ['is_published', 'is_deleted', 'tariff_user', 'date_published', 'created_at']
     search_fields = ['user_id', 'post_id', 'post_text', 'admin_id']
-    readonly_fields = ['id', 'created_at', 'updated_at', 'post_media_preview', 'is_deleted', 'date_deleted']
+    readonly_fields = [
+        'id', 'created_at', 'updated_at', 'post_media_preview', 'is_deleted', 'date_deleted',
+        'next_check_at', 'last_checked_at'
+    ]
     list_per_page = 50
     actions = ['check_posts_exist', 'repost_to_channel', 'delete_from_channel']
     change_list_template = 'admin/bot/userposts_changelist.html'
@@ -125,6 +132,10 @@ class UserPostsAdmin(admin.ModelAdmin):
         ('Статус', {
             'fields': ('is_published', 'is_deleted', 'date_published', 'date_deleted', 'tariff_user')
         }),
+        ('Проверка в канале', {
+            'fields': ('next_check_at', 'last_checked_at'),
+            'classes': ('collapse',)
+        }),
         ('Даты', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -174,10 +185,7 @@ class UserPostsAdmin(admin.ModelAdmin):
                     error_desc = result.get('description', '').lower()
                     if 'message to copy not found' in error_desc or 'message not found' in error_desc:
                         # Пост удалён
-                        from django.utils import timezone
-                        post.is_deleted = True
-                        post.date_deleted = timezone.now()
-                        post.save(update_fields=['is_deleted', 'date_deleted'])
+                        post.mark_deleted()
                         deleted_count += 1
                     else:
                         checked_count += 1
@@ -308,13 +316,12 @@ class UserPostsAdmin(admin.ModelAdmin):
                             new_post_message_ids = [new_post_id]
                     
                     # Создаём новую запись поста
-                    UserPosts.objects.create(
+                    UserPosts.publish(
                         user_id=post.user_id,
                         post_id=new_post_id,
                         post_message_ids=new_post_message_ids if new_post_message_ids else None,
                         post_text=post.post_text,
                         post_media_list=post.post_media_list,
-                        is_published=True,
                         date_published=datetime.now(tz.utc),
                         admin_id=request.user.id,
                         tariff_user=post.tariff_user,
@@ -341,7 +348,6 @@ class UserPostsAdmin(admin.ModelAdmin):
         """Удаляет выбранные посты из канала Telegram"""
         import sys
         from pathlib import Path
-        from django.utils import timezone
         
         BASE_DIR = Path(__file__).resolve().parent.parent.parent
         sys.path.append(str(BASE_DIR))
@@ -395,9 +401,7 @@ class UserPostsAdmin(admin.ModelAdmin):
                         # Другие ошибки игнорируем для отдельных сообщений
                 
                 if post_deleted:
-                    post.is_deleted = True
-                    post.date_deleted = timezone.now()
-                    post.save(update_fields=['is_deleted', 'date_deleted'])
+                    post.mark_deleted()
                     deleted_count += 1
                 else:
                     error_count += 1
@@ -552,6 +556,10 @@ class LoggerAdmin(admin.ModelAdmin):
     readonly_fields = ['id', 'timestamp', 'user_id', 'user_name', 'type', 'action']
     list_per_page = 100
     date_hierarchy = 'timestamp'
+    # Порядок по id идёт по первичному ключу (id, timestamp) каждой партиции,
+    # а полный count(*) по всей истории на каждой странице не нужен
+    ordering = ['-id']
+    show_full_result_count = False
     
     def has_add_permission(self, request):
         return False
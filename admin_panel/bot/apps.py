@@ -5,3 +5,6 @@ class BotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bot'
     verbose_name = 'Бот'
+
+    def ready(self):
+        from . import signals  # noqa: F401
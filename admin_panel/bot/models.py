@@ -1,6 +1,14 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField
 
+from config_data.config import ConfigEnv, load_config
+
+config: ConfigEnv = load_config()
+
 
 class UserStatus(models.TextChoices):
     ACTIVE = 'active', 'Активен'
@@ -49,7 +57,12 @@ class Users(models.Model):
         verbose_name='Тариф'
     )
     
+    last_delivery_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя доставка')
+
     total_posts = models.IntegerField(default=0, verbose_name='Всего постов')
+    active_posts = models.IntegerField(default=0, verbose_name='Активных постов')
+    deleted_posts = models.IntegerField(default=0, verbose_name='Удалённых постов')
+    last_published_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя публикация')
     notes = models.TextField(null=True, blank=True, verbose_name='Заметки')
 
     class Meta:
@@ -86,6 +99,8 @@ class UserPosts(models.Model):
     is_deleted = models.BooleanField(default=False, verbose_name='Удалён в Telegram')
     date_published = models.DateTimeField(null=True, blank=True, verbose_name='Дата публикации')
     date_deleted = models.DateTimeField(null=True, blank=True, verbose_name='Дата удаления')
+    next_check_at = models.DateTimeField(null=True, blank=True, verbose_name='Следующая проверка')
+    last_checked_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя проверка')
     admin_id = models.BigIntegerField(null=True, blank=True, verbose_name='Admin ID')
     tariff_user = models.CharField(
         max_length=20, 
@@ -107,6 +122,43 @@ class UserPosts(models.Model):
     def __str__(self):
         return f"Пост #{self.post_id} от {self.user_id}"
 
+    @classmethod
+    def publish(cls, **fields):
+        """
+        Создаёт опубликованный пост и в той же транзакции обновляет счётчики пользователя.
+        Первая проверка существования — через минимальный интервал, как у постов из бота
+        """
+        now = timezone.now()
+        fields.setdefault('date_published', now)
+        fields.update(
+            next_check_at=now + timedelta(minutes=config.post_check.min_interval),
+            last_checked_at=None,
+        )
+        with transaction.atomic():
+            post = cls.objects.create(is_published=True, **fields)
+            Users.objects.filter(user_id=post.user_id).update(
+                total_posts=F('total_posts') + 1,
+                active_posts=F('active_posts') + 1,
+                last_published_at=post.date_published,
+            )
+        return post
+
+    def mark_deleted(self):
+        """Помечает пост удалённым и переносит его в deleted_posts пользователя"""
+        now = timezone.now()
+        with transaction.atomic():
+            # Уже удалённый пост не трогаем, чтобы не сбить счётчики
+            updated = UserPosts.objects.filter(pk=self.pk, is_deleted=False).update(
+                is_deleted=True, date_deleted=now, updated_at=now
+            )
+            if updated:
+                Users.objects.filter(user_id=self.user_id).update(
+                    active_posts=F('active_posts') - 1,
+                    deleted_posts=F('deleted_posts') + 1,
+                )
+        self.is_deleted = True
+        self.date_deleted = now
+
 
 class UserThread(models.Model):
     """Модель топиков пользователей"""
@@ -0,0 +1,29 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Users
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Кэш зарегистрированных пользователей бота (app/service/known_users.py)
+KNOWN_USERS_KEY = "users:known"
+
+
+@receiver(post_delete, sender=Users)
+def forget_known_user(sender, instance: Users, **kwargs):
+    """Убирает удалённого пользователя из кэша бота, чтобы /start снова его зарегистрировал"""
+    # После delete() Django обнуляет первичный ключ экземпляра
+    user_id = instance.user_id
+
+    def forget():
+        try:
+            get_redis().hdel(KNOWN_USERS_KEY, user_id)
+        except Exception as e:
+            logger.warning(f"Не удалось удалить пользователя {user_id} из кэша бота: {e}")
+
+    # После commit: иначе /start до фиксации удаления снова пометит пользователя известным
+    transaction.on_commit(forget)
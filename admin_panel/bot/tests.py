@@ -1,3 +1,60 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import UserPosts, Users, config
+from .signals import KNOWN_USERS_KEY
+
+
+class UnmanagedTablesMixin:
+    """Таблицы бота создаёт Alembic, поэтому в тестовой базе их создаём сами"""
+
+    models = ()
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            for model in cls.models:
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            for model in reversed(cls.models):
+                editor.delete_model(model)
+
+
+class PublishPostTests(UnmanagedTablesMixin, TestCase):
+    models = (Users, UserPosts)
+
+    def due_posts(self, now):
+        """Те же условия, что у PostsORM.iter_due_posts в проверке удалённых постов"""
+        return UserPosts.objects.filter(is_published=True, is_deleted=False, next_check_at__lte=now)
+
+    def test_published_post_is_scheduled_for_check(self):
+        post = UserPosts.publish(user_id=1, post_id=100, post_message_ids=[100], admin_id=1)
+
+        self.assertIsNotNone(post.next_check_at)
+        self.assertIsNone(post.last_checked_at)
+        self.assertIsNotNone(post.date_published)
+
+        # Пост ждёт минимальный интервал и затем попадает в очередь проверки
+        self.assertFalse(self.due_posts(timezone.now()).filter(pk=post.pk).exists())
+        later = timezone.now() + timedelta(minutes=config.post_check.min_interval, seconds=1)
+        self.assertTrue(self.due_posts(later).filter(pk=post.pk).exists())
+
+
+class DeleteUserTests(UnmanagedTablesMixin, TestCase):
+    models = (Users,)
 
-# Create your tests here.
+    def test_deleted_user_is_removed_from_bot_cache(self):
+        user = Users.objects.create(user_id=42, user_name='test')
+        with mock.patch('bot.signals.get_redis') as get_redis:
+            with self.captureOnCommitCallbacks(execute=True):
+                user.delete()
+        get_redis.return_value.hdel.assert_called_once_with(KNOWN_USERS_KEY, 42)
@@ -204,13 +204,12 @@ def create_post(request):
                     post_message_ids = [post_id]
             
             # Сохраняем в БД
-            post = UserPosts.objects.create(
+            post = UserPosts.publish(
                 user_id=user_id,
                 post_id=post_id,
                 post_message_ids=post_message_ids if post_message_ids else None,
                 post_text=post_text,
                 post_media_list=s3_keys if s3_keys else None,
-                is_published=True,
                 date_published=datetime.now(timezone.utc),
                 admin_id=request.user.id,
             )
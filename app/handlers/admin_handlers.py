@@ -17,7 +17,12 @@ from app.service.openai_service import generate_post_text
 from app.keybords.keybords import kb_admin_post_actions, kb_admin_cancel
 from config_data.config import ConfigEnv, load_config
 from s3.s3_client import upload_to_s3
-from db.ORM import PostsORM, ThreadORM
+from app.service.delivery import delivery_status
+from app.service.local_cache import flags
+from app.service.thread_cache import thread_cache
+from db.database import release_session
+from db.models import UserStatus
+from db.ORM import DataBase, PostsORM
 
 config: ConfigEnv = load_config()
 router = Router()
@@ -76,19 +81,13 @@ async def moderate_channel_media_group(message: Message, bot: Bot, album: list[M
         await bot.delete_messages(chat_id=CHANNEL_ID, message_ids=message_ids_all)
         logger.info(f"[CHANNEL_MOD] Удалено {len(message_ids_all)} сообщений медиагруппы от {user_id}")
         
-        # Отправляем уведомление с дедупликацией через Redis
-        from app.service.redis_client import redis
-        
-        key = f"channel_warning:{user_id}"
-        is_warned = await redis.get(key)
-        
-        if not is_warned:
+        # Отправляем уведомление не чаще раза в 25 секунд на пользователя
+        if await flags.set_once(f"channel_warning:{user_id}", ttl=25):
             warning_msg = await bot.send_message(
                 chat_id=CHANNEL_ID,
                 text=f"📢 Для размещения объявлений пишите боту @{BOT_USERNAME}",
                 disable_notification=True
             )
-            await redis.set(key, "1", ex=25)
             
             await asyncio.sleep(20)
             try:
@@ -142,19 +141,13 @@ async def moderate_channel_messages(message: Message, bot: Bot):
         if is_service_message:
             return
         
-        # Отправляем уведомление с дедупликацией через Redis
-        from app.service.redis_client import redis
-        
-        key = f"channel_warning:{user_id}"
-        is_warned = await redis.get(key)
-        
-        if not is_warned:
+        # Отправляем уведомление не чаще раза в 25 секунд на пользователя
+        if await flags.set_once(f"channel_warning:{user_id}", ttl=25):
             warning_msg = await bot.send_message(
                 chat_id=CHANNEL_ID,
                 text=f"📢 Для размещения объявлений пишите боту @{BOT_USERNAME}",
                 disable_notification=True
             )
-            await redis.set(key, "1", ex=25)  # Блокируем повторные на 25 сек
             
             # Удаляем уведомление через 20 секунд
             await asyncio.sleep(20)
@@ -347,6 +340,7 @@ async def process_admin_media(message: Message, bot: Bot, state: FSMContext, alb
             )
             return
         
+        await release_session()  # соединение с БД не ждёт ответа OpenAI
         generated_text = await generate_post_text(original_text, sender_info=sender_info)
         
         # user_id - пользователь из пересылки, или админ если пересылки нет
@@ -424,6 +418,7 @@ async def process_pending_text(message: Message, bot: Bot, state: FSMContext):
         post_user_id = forward_user_id or message.from_user.id
         
         # Генерируем текст через GPT с информацией об отправителе
+        await release_session()  # соединение с БД не ждёт ответа OpenAI
         generated_text = await generate_post_text(original_text, sender_info=sender_info)
         
         # Сохраняем данные
@@ -479,6 +474,7 @@ async def admin_publish_post(callback: CallbackQuery, bot: Bot, state: FSMContex
         admin_id = data.get("admin_id")
         
         s3_keys = []
+        await release_session()  # соединение с БД не ждёт загрузки в S3
         for i, media in enumerate(media_file_ids):
             file = await bot.get_file(media["file_id"])
             file_bytes = await bot.download_file(file.file_path)
@@ -609,6 +605,7 @@ async def admin_receive_gpt_correction(message: Message, bot: Bot, state: FSMCon
         original_text = data.get("original_text", "")
         current_text = data.get("generated_text", original_text)
         
+        await release_session()  # соединение с БД не ждёт ответа OpenAI
         new_text = await generate_post_text(current_text, correction)
         
         await state.update_data(generated_text=new_text)
@@ -660,13 +657,19 @@ async def process_admin_reply(message: Message, bot: Bot, album: list[Message] =
     """Обработка ответов админа из топика группы"""
     logger.info(f"[ADMIN_REPLY] Получено сообщение от админа: thread_id={message.message_thread_id}")
     
-    user_id = await ThreadORM.get_user_by_thread_id(message.message_thread_id)
+    user_id = await thread_cache.get_user_id(message.message_thread_id)
     logger.info(f"[ADMIN_REPLY] Найден user_id={user_id} для thread_id={message.message_thread_id}")
     
     if not user_id:
         await message.reply("❌ Не найден пользователь для этого топика")
         return
     
+    # Заблокировавшим бота и удалённым не отправляем — запрос всё равно вернёт ошибку
+    user = await DataBase.get_user(user_id)
+    if user and user.user_status in (UserStatus.blocked, UserStatus.deleted):
+        await message.reply("❌ Пользователь заблокировал бота или удалил аккаунт, сообщение не отправлено")
+        return
+    
     try:
         if album:
             media_group = []
@@ -709,6 +712,9 @@ async def process_admin_reply(message: Message, bot: Bot, album: list[Message] =
         
     except Exception as e:
         logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        status = delivery_status(e)
+        if status:
+            await DataBase.set_user_status(user_id, status)
         await message.reply(f"❌ Ошибка при отправке: {str(e)[:100]}", parse_mode=None)
 
 
@@ -7,17 +7,26 @@
 """
 import asyncio
 import logging
+import math
 from datetime import datetime
+from typing import Union
 
 from aiogram.fsm.context import FSMContext
 from aiogram import Router, F, Bot
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.enums import ChatMemberStatus
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, ChatMemberUpdated
 
-from app.service.functions import check_throttle
-from app.service.redis_client import redis
+from app.service.known_users import register_user
+from app.service.local_cache import flags
+from app.service.rate_limiter import rate_limiter
+from app.service.redis_lock import RedisLock
+from app.service.spare_topics import assign_spare_topic
+from app.service.thread_cache import thread_cache
 from app.keybords.keybords import kb_language
 from config_data.config import ConfigEnv, load_config
+from db.models import UserStatus
 from db.ORM import DataBase, ThreadORM
 from app.lexicon.lexicon import LEXICON
 
@@ -25,12 +34,34 @@ config: ConfigEnv = load_config()
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Сколько раз пытаться получить топик, если владелец блокировки не создал его
+TOPIC_LOCK_ATTEMPTS = 3
+
+
+async def check_rate_limit(event: Union[Message, CallbackQuery], action: str) -> bool:
+    """Учитывает действие пользователя; сверх лимита сообщает, через сколько его можно повторить"""
+    result = await rate_limiter.hit(event.from_user.id, action)
+    if result.allowed:
+        return True
+    await notify_rate_limited(event, result.retry_after, 'rate_limited')
+    return False
+
+
+async def notify_rate_limited(event: Union[Message, CallbackQuery], retry_after: float, lexicon_key: str):
+    text = LEXICON[lexicon_key].format(seconds=math.ceil(retry_after))
+    if isinstance(event, CallbackQuery):
+        # На колбэк всё равно нужно ответить — подсказка показывается во всплывающем уведомлении
+        await event.answer(text)
+    elif await flags.set_once(f"user:{event.from_user.id}:rate_limited", ttl=max(retry_after, 1)):
+        # Одно предупреждение на период ограничения, чтобы ответы не стали тем же флудом
+        await event.answer(text)
+
 
 # ==================== КОМАНДЫ ====================
 
 @router.message(Command(commands='start'), F.chat.type == "private")
 async def command_start_handler(message: Message, state: FSMContext):
-    if await check_throttle(message.from_user.id, message.text):
+    if not await check_rate_limit(message, "command"):
         return
     await state.clear()
 
@@ -41,13 +72,13 @@ async def command_start_handler(message: Message, state: FSMContext):
         await message.answer("Пришли объявление для публикации")
         return
 
-    await DataBase.insert_user(user_id, user_name)
+    await register_user(user_id, user_name)
     await message.answer(LEXICON['select_language'], reply_markup=kb_language())
 
 
 @router.callback_query(F.data.startswith('language_'))
 async def process_language(callback: CallbackQuery, state: FSMContext):
-    if await check_throttle(callback.from_user.id, callback.data):
+    if not await check_rate_limit(callback, "callback"):
         return
     
     try:
@@ -62,7 +93,7 @@ async def process_language(callback: CallbackQuery, state: FSMContext):
 
 @router.message(Command(commands='select_language'), F.chat.type == "private")
 async def command_select_language_handler(message: Message, state: FSMContext):
-    if await check_throttle(message.from_user.id, message.text):
+    if not await check_rate_limit(message, "command"):
         return
     
     try:
@@ -75,7 +106,7 @@ async def command_select_language_handler(message: Message, state: FSMContext):
 
 @router.message(Command(commands='info'), F.chat.type == "private")
 async def command_info_handler(message: Message, state: FSMContext):
-    if await check_throttle(message.from_user.id, message.text):
+    if not await check_rate_limit(message, "command"):
         return
     
     try:
@@ -89,14 +120,124 @@ async def command_info_handler(message: Message, state: FSMContext):
         await message.answer(LEXICON[f'form_post_{lang}'])
 
 
+@router.my_chat_member(F.chat.type == "private")
+async def process_bot_status(event: ChatMemberUpdated):
+    """Пользователь заблокировал или разблокировал бота"""
+    status = event.new_chat_member.status
+    if status == ChatMemberStatus.KICKED:
+        await DataBase.set_user_status(event.from_user.id, UserStatus.blocked)
+    elif status == ChatMemberStatus.MEMBER:
+        await DataBase.set_user_status(event.from_user.id, UserStatus.active)
+
+
 # ==================== СООБЩЕНИЯ В ТОПИКИ ====================
 
+async def get_user_thread_id(bot: Bot, user_id: int, user_name: str) -> int:
+    """Возвращает thread_id топика пользователя, при необходимости создаёт топик"""
+    thread_id = await thread_cache.get_thread_id(user_id)
+    if thread_id:
+        return thread_id
+
+    # Топик создаёт только владелец блокировки, остальные ждут его результат.
+    # Несколько попыток — на случай, если владелец упал, не создав топик
+    lock = RedisLock(f"create_topic:{user_id}", ttl=10)
+    for _ in range(TOPIC_LOCK_ATTEMPTS):
+        if await lock.acquire():
+            thread_id = None
+            try:
+                # Создание ждёт лимитов Telegram для группы и может идти дольше TTL
+                async with lock.keep_alive():
+                    thread_id = await create_user_thread(bot, user_id, user_name)
+            finally:
+                await lock.release(str(thread_id or ""))
+        else:
+            result = await lock.wait()
+            if result:
+                thread_id = int(result)
+            else:
+                # Владелец не передал результат — смотрим в БД
+                thread = await ThreadORM.get_or_create_thread(user_id, user_name)
+                thread_id = thread.thread_id if thread else None
+
+        if thread_id:
+            await thread_cache.remember(user_id, thread_id)
+            return thread_id
+
+    raise RuntimeError(f"Не удалось получить топик пользователя {user_id}")
+
+
+async def create_user_thread(bot: Bot, user_id: int, user_name: str) -> int:
+    """Создаёт топик пользователя в группе, если его ещё нет. Вызывать под блокировкой create_topic"""
+    TG_MESSAGE_GROUP_ID = config.tg_bot.tg_message_group_id
+
+    # Ещё раз проверяем после получения блокировки
+    thread = await ThreadORM.get_or_create_thread(user_id, user_name)
+    if thread:
+        return thread.thread_id
+
+    topic_name = f"@{user_name} (ID: {user_id})"
+    intro_text = (
+        f"🆕 Новое обращение от пользователя:\n"
+        f"👤 Username: @{user_name}\n"
+        f"🆔 User ID: {user_id}\n"
+        f"📅 Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    )
+
+    # Быстрый путь: готовый свободный топик, иначе создаём новый
+    thread_id = await assign_spare_topic(bot, topic_name, intro_text)
+    if thread_id is None:
+        forum_topic = await bot.create_forum_topic(
+            chat_id=TG_MESSAGE_GROUP_ID,
+            name=topic_name
+        )
+        thread_id = forum_topic.message_thread_id
+        await bot.send_message(
+            chat_id=TG_MESSAGE_GROUP_ID,
+            message_thread_id=thread_id,
+            text=intro_text
+        )
+
+    thread = await ThreadORM.get_or_create_thread(
+        user_id=user_id,
+        user_name=user_name,
+        thread_id=thread_id
+    )
+    return thread.thread_id
+
+
+async def forward_to_thread(bot: Bot, message: Message, thread_id: int, album: list[Message] = None):
+    """Пересылает сообщение пользователя в его топик"""
+    TG_MESSAGE_GROUP_ID = config.tg_bot.tg_message_group_id
+
+    # Пересылаем сообщения (сохраняет информацию об отправителе)
+    if album:
+        # Пересылаем альбом целиком
+        message_ids = [msg.message_id for msg in album]
+        await bot.forward_messages(
+            chat_id=TG_MESSAGE_GROUP_ID,
+            from_chat_id=album[0].chat.id,
+            message_ids=message_ids,
+            message_thread_id=thread_id
+        )
+    else:
+        # Пересылаем одиночное сообщение
+        await bot.forward_message(
+            chat_id=TG_MESSAGE_GROUP_ID,
+            from_chat_id=message.chat.id,
+            message_id=message.message_id,
+            message_thread_id=thread_id
+        )
+
+
 @router.message(F.chat.type == "private")
 async def process_user_message(message: Message, bot: Bot, album: list[Message] = None):
     """Обработка сообщений от пользователей в личке"""
-    if await check_throttle(message.from_user.id, message.text):
+    # Сообщение сверх лимита ждёт своей очереди, а не теряется
+    limit = await rate_limiter.wait(message.from_user.id, "message", config.rate_limits.message_max_wait)
+    if not limit.allowed:
+        await notify_rate_limited(message, limit.retry_after, 'message_rate_limited')
         return
-    
+
     user_id = message.from_user.id
     user_name = message.from_user.username or "NO_USERNAME"
     
@@ -104,71 +245,20 @@ async def process_user_message(message: Message, bot: Bot, album: list[Message]
     if user_id in config.tg_bot.admin_ids:
         return
     
-    TG_MESSAGE_GROUP_ID = config.tg_bot.tg_message_group_id
-    
     try:
-        thread = await ThreadORM.get_or_create_thread(user_id, user_name)
-        
-        if not thread:
-            # Используем Redis lock для предотвращения создания дубликатов
-            lock_key = f"create_topic:{user_id}"
-            lock = await redis.get(lock_key)
-            
-            if lock:
-                # Другой запрос уже создаёт топик, ждём
-                await asyncio.sleep(1)
-                thread = await ThreadORM.get_or_create_thread(user_id, user_name)
-            else:
-                # Устанавливаем блокировку
-                await redis.set(lock_key, "1", ex=10)
-                
-                try:
-                    # Ещё раз проверяем после получения блокировки
-                    thread = await ThreadORM.get_or_create_thread(user_id, user_name)
-                    
-                    if not thread:
-                        topic_name = f"@{user_name} (ID: {user_id})"
-                        
-                        forum_topic = await bot.create_forum_topic(
-                            chat_id=TG_MESSAGE_GROUP_ID,
-                            name=topic_name
-                        )
-                        
-                        thread = await ThreadORM.get_or_create_thread(
-                            user_id=user_id,
-                            user_name=user_name,
-                            thread_id=forum_topic.message_thread_id
-                        )
-                        
-                        await bot.send_message(
-                            chat_id=TG_MESSAGE_GROUP_ID,
-                            message_thread_id=thread.thread_id,
-                            text=f"🆕 Новое обращение от пользователя:\n"
-                                 f"👤 Username: @{user_name}\n"
-                                 f"🆔 User ID: {user_id}\n"
-                                 f"📅 Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                        )
-                finally:
-                    await redis.delete(lock_key)
-        
-        # Пересылаем сообщения (сохраняет информацию об отправителе)
-        if album:
-            # Пересылаем альбом целиком
-            message_ids = [msg.message_id for msg in album]
-            await bot.forward_messages(
-                chat_id=TG_MESSAGE_GROUP_ID,
-                from_chat_id=album[0].chat.id,
-                message_ids=message_ids,
-                message_thread_id=thread.thread_id
-            )
-        else:
-            # Пересылаем одиночное сообщение
-            await bot.forward_message(
-                chat_id=TG_MESSAGE_GROUP_ID,
-                from_chat_id=message.chat.id,
-                message_id=message.message_id,
-                message_thread_id=thread.thread_id
-            )
+        thread_id = await get_user_thread_id(bot, user_id, user_name)
+        try:
+            await forward_to_thread(bot, message, thread_id, album)
+        except TelegramBadRequest as e:
+            if "thread not found" not in str(e).lower():
+                raise
+            # Топик удалили в группе — забываем его и заводим новый
+            # (если другой процесс уже завёл новый топик, удаление его не тронет и вернётся он)
+            logger.warning(f"Топик {thread_id} пользователя {user_id} не найден, создаю новый")
+            await ThreadORM.delete_thread(user_id, thread_id)
+            await thread_cache.invalidate(user_id, thread_id)
+            thread_id = await get_user_thread_id(bot, user_id, user_name)
+            await forward_to_thread(bot, message, thread_id, album)
         
         # Подтверждаем получение реакцией
         try:
@@ -192,14 +282,12 @@ async def process_chat_message(message: Message, bot: Bot):
 
     await message.delete()
     
-    key = f"user:{message.from_user.id}:messages"
     user_name = message.from_user.username
 
-    is_violation = await redis.get(key)
-    if not is_violation:
+    # Подсказку показываем не чаще раза в 19 секунд на пользователя
+    if await flags.set_once(f"user:{message.from_user.id}:messages", ttl=19):
         message_info = await message.answer(
             text=f'Здравствуйте! @{user_name}\nДля размещения объявления, напишите боту в личку\n @Auto_georgian_bot'
         )
-        await redis.set(key, '1', ex=19)
         await asyncio.sleep(20)
         await message_info.delete()
@@ -3,6 +3,12 @@ LEXICON: dict[str, str] = {
     'language_ru': '🇷🇺 Русский',
     'language_en': '🇬🇧 English',
     'language_ge': '🇬🇪 Georgian',
+    'rate_limited': '⏳ Слишком часто. Повторите через {seconds} с\n'
+                    '⏳ Too many requests. Try again in {seconds} s\n'
+                    '⏳ ძალიან ხშირად. სცადეთ {seconds} წამში',
+    'message_rate_limited': '⏳ Слишком много сообщений. Это сообщение не доставлено — отправьте его через {seconds} с\n'
+                            '⏳ Too many messages. This message was not delivered — send it again in {seconds} s\n'
+                            '⏳ ძალიან ბევრი შეტყობინება. ეს შეტყობინება არ მიწოდებულა — გაგზავნეთ {seconds} წამში',
     'form_post_ru': '''📝 <b>Для размещения объявления отправьте:</b>
 
 📷 Фото/видео автомобиля (можно несколько)
@@ -0,0 +1,46 @@
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from db.database import current_session, current_user_id, mark_user_write, release_session, session_factory_async
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Middleware unit of work: одна сессия БД на весь апдейт.
+    Сессия передаётся в обработчики как `session` и подхватывается ORM-методами
+    через current_session. Коммит — один раз в конце обработки апдейта.
+    Соединение из пула берётся только при первом запросе к БД,
+    а перед запросами к Telegram транзакция фиксируется (ReleaseSessionMiddleware).
+    Каждый ORM-метод работает в своём SAVEPOINT — его ошибка не откатывает остальное.
+    Если апдейт что-то записал, чтения этого пользователя ещё какое-то время идут на primary.
+    """
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        user_id = user.id if user else None
+        async with session_factory_async() as session:
+            session.info["unit_of_work"] = True
+            token = current_session.set(session)
+            user_token = current_user_id.set(user_id)
+            data["session"] = session
+            try:
+                result = await handler(event, data)
+                await session.commit()
+                if session.info.get("has_writes"):
+                    mark_user_write(user_id)
+                return result
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                current_user_id.reset(user_token)
+                current_session.reset(token)
+
+
+class ReleaseSessionMiddleware(BaseRequestMiddleware):
+    """
+    Middleware запросов к Bot API: перед запросом фиксирует unit of work апдейта,
+    чтобы соединение с БД не простаивало в открытой транзакции, пока ждём Telegram
+    """
+    async def __call__(self, make_request, bot, method):
+        await release_session()
+        return await make_request(bot, method)
@@ -0,0 +1,163 @@
+"""
+Движок массовой рассылки:
+- общий token bucket под лимит Telegram (~30 сообщений/сек на бота)
+- ограниченный пул воркеров, читающих получателей из очереди
+- при TelegramRetryAfter пауза ставится на весь bucket, а не на одного воркера
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket, общий для всех воркеров.
+    Выдаёт не больше rate токенов в секунду с запасом burst.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов всем ожидающим на seconds секунд"""
+        paused_until = time.monotonic() + seconds
+        if paused_until > self._paused_until:
+            self._paused_until = paused_until
+            self._updated = paused_until
+            self._tokens = 0
+
+    async def acquire(self):
+        """Ждёт, пока в bucket появится токен, и забирает его"""
+        # Лок держится на время ожидания — воркеры получают токены по очереди (FIFO)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BroadcastStats:
+    """Итоги рассылки"""
+    success: int = 0
+    failed: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+
+    @property
+    def processed(self) -> int:
+        return self.success + self.failed
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+SendFunc = Callable[[int], Awaitable[Any]]
+ResultCallback = Callable[[int, Optional[Exception]], Awaitable[None]]
+
+
+async def broadcast(
+    recipients: Union[Iterable[int], AsyncIterable[int]],
+    send: SendFunc,
+    bucket: TokenBucket,
+    workers: int = 20,
+    max_retries: int = 3,
+    on_result: Optional[ResultCallback] = None,
+) -> BroadcastStats:
+    """
+    Отправляет сообщение всем получателям пулом воркеров
+
+    Args:
+        recipients: ID получателей (обычный или асинхронный итератор)
+        send: Корутина отправки одному получателю
+        bucket: Общий token bucket рассылок
+        workers: Размер пула воркеров
+        max_retries: Сколько раз повторять отправку после TelegramRetryAfter
+        on_result: Колбэк с результатом по каждому получателю (None — успешно)
+
+    Returns:
+        Статистика рассылки
+    """
+    stats = BroadcastStats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+
+    async def produce():
+        try:
+            if isinstance(recipients, AsyncIterable):
+                async for user_id in recipients:
+                    await queue.put(user_id)
+            else:
+                for user_id in recipients:
+                    await queue.put(user_id)
+        finally:
+            # Сигнал остановки каждому воркеру
+            for _ in range(workers):
+                await queue.put(None)
+
+    async def send_one(user_id: int) -> Optional[Exception]:
+        for attempt in range(max_retries + 1):
+            await bucket.acquire()
+            try:
+                await send(user_id)
+                return None
+            except TelegramRetryAfter as e:
+                # Flood control касается всего бота — останавливаем всех воркеров
+                logger.warning(f"[BROADCAST] Flood control, пауза {e.retry_after} сек.")
+                bucket.pause(e.retry_after)
+                stats.retries += 1
+                if attempt == max_retries:
+                    return e
+            except Exception as e:
+                return e
+
+    async def work():
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+
+            error = await send_one(user_id)
+            if error is None:
+                stats.success += 1
+                logger.debug(f"Успешная отправка пользователю {user_id}")
+            else:
+                stats.failed += 1
+                logger.info(f"Ошибка при отправке пользователю {user_id}: {error}")
+
+            if on_result:
+                try:
+                    await on_result(user_id, error)
+                except Exception as e:
+                    logger.error(f"[BROADCAST] Ошибка в обработчике результата для {user_id}: {e}")
+
+    producer = asyncio.create_task(produce())
+    try:
+        await asyncio.gather(*(work() for _ in range(workers)))
+        await producer
+    finally:
+        producer.cancel()
+        stats.finished_at = time.monotonic()
+
+    return stats
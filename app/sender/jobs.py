@@ -0,0 +1,246 @@
+"""
+Выполнение задач рассылки:
+- получатели обходятся по возрастанию user_id, результаты пишутся в БД пачками вместе с курсором
+- после рестарта незавершённые задачи продолжаются с курсора без повторной отправки
+- прогресс показывается правкой одного сообщения админу
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from app.sender.broadcast import TokenBucket, broadcast
+from app.service.delivery import delivery_status
+from config_data.config import ConfigEnv, load_config
+from db.models import BroadcastJob, BroadcastStatus
+from db.ORM import BroadcastORM, DataBase
+
+logger = logging.getLogger(__name__)
+config: ConfigEnv = load_config()
+
+# Общий лимит для всех рассылок бота
+broadcast_bucket = TokenBucket(rate=config.broadcast.rate)
+
+# Как часто обновлять сообщение с прогрессом (сек.)
+PROGRESS_INTERVAL = 5
+# Сколько результатов доставки копить перед записью в БД
+FLUSH_SIZE = 200
+
+# Ссылки на фоновые рассылки, чтобы задачи не собрал GC
+job_tasks: set[asyncio.Task] = set()
+
+
+def build_sender(bot: Bot, payload: dict):
+    """
+    Возвращает корутину отправки сообщения рассылки одному получателю.
+    Исходные сообщения админа копируются на стороне Telegram одним вызовом
+    copyMessage/copyMessages — так работают любые типы контента, включая альбомы.
+    """
+    from_chat_id = payload.get('from_chat_id')
+    message_ids = payload.get('message_ids')
+    if not from_chat_id or not message_ids:
+        raise ValueError("В задаче рассылки нет исходного сообщения для копирования")
+
+    if len(message_ids) == 1:
+        return lambda user_id: bot.copy_message(chat_id=user_id, from_chat_id=from_chat_id, message_id=message_ids[0])
+    return lambda user_id: bot.copy_messages(chat_id=user_id, from_chat_id=from_chat_id, message_ids=message_ids)
+
+
+async def count_recipients(recipient_type: str, ids: Optional[list[int]]) -> int:
+    """Считает получателей рассылки — так же, как их обходит iter_job_recipients"""
+    return await DataBase.count_recipients(**recipients_filter(recipient_type, ids))
+
+
+def recipients_filter(recipient_type: str, ids: Optional[list[int]]) -> dict:
+    """Параметры выборки получателей по типу рассылки"""
+    if recipient_type == "send_selected":
+        return {"only_ids": sorted(set(ids or []))}
+    if recipient_type == "exclude_ids":
+        return {"exclude_ids": ids}
+    return {}
+
+
+async def iter_job_recipients(job: BroadcastJob) -> AsyncIterator[int]:
+    """Отдаёт оставшихся получателей рассылки по возрастанию user_id"""
+    recipients = DataBase.iter_recipient_ids(
+        after_user_id=job.cursor or 0,
+        job_id=job.id,
+        **recipients_filter(job.recipient_type, job.recipient_ids)
+    )
+    async for user_id in recipients:
+        yield user_id
+
+
+class DeliveryRecorder:
+    """
+    Копит результаты доставки и пачками сохраняет их в БД.
+    Курсор сдвигается только до первого получателя, чей результат ещё не записан.
+    """
+
+    def __init__(self, job: BroadcastJob):
+        self.job_id = job.id
+        self.cursor = job.cursor or 0
+        self.success = job.success_count or 0
+        self.failed = job.failed_count or 0
+        self._dispatched: deque[int] = deque()
+        self._done: set[int] = set()
+        self._buffer: list[tuple[int, Optional[Exception]]] = []
+        self._lock = asyncio.Lock()
+
+    @property
+    def processed(self) -> int:
+        return self.success + self.failed
+
+    async def track(self, recipients: Union[Iterable[int], AsyncIterable[int]]) -> AsyncIterator[int]:
+        """Запоминает порядок выдачи получателей воркерам"""
+        if isinstance(recipients, AsyncIterable):
+            async for user_id in recipients:
+                self._dispatched.append(user_id)
+                yield user_id
+        else:
+            for user_id in recipients:
+                self._dispatched.append(user_id)
+                yield user_id
+
+    async def record(self, user_id: int, error: Optional[Exception]):
+        """Колбэк результата доставки для broadcast()"""
+        if error is None:
+            self.success += 1
+        else:
+            self.failed += 1
+        self._buffer.append((user_id, error))
+        if len(self._buffer) >= FLUSH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        """Записывает накопленные результаты, новый курсор и статусы недоступных пользователей"""
+        async with self._lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            done = self._done | {user_id for user_id, _ in batch}
+
+            # Сдвигаем курсор по непрерывному префиксу обработанных получателей
+            shift = 0
+            cursor = self.cursor
+            for user_id in self._dispatched:
+                if user_id not in done:
+                    break
+                cursor = user_id
+                shift += 1
+
+            deliveries = [
+                {"user_id": user_id, "is_sent": error is None, "error": str(error)[:500] if error else None}
+                for user_id, error in batch
+            ]
+            if not await BroadcastORM.save_progress(self.job_id, deliveries, cursor):
+                # Вернём пачку в буфер — попробуем записать при следующем сбросе
+                self._buffer = batch + self._buffer
+                return
+
+            self._done = done
+            for _ in range(shift):
+                self._done.discard(self._dispatched.popleft())
+            self.cursor = cursor
+
+            # Заблокировавших бота и удалённых больше не трогаем в следующих рассылках
+            delivered_ids = [user_id for user_id, error in batch if error is None]
+            statuses = {}
+            for user_id, error in batch:
+                status = delivery_status(error)
+                if status:
+                    statuses[user_id] = status
+            await DataBase.apply_delivery_outcomes(delivered_ids, statuses)
+
+
+def progress_text(job: BroadcastJob, recorder: DeliveryRecorder, started_at: float, finished: bool = False) -> str:
+    """Текст сообщения с прогрессом рассылки"""
+    elapsed = time.monotonic() - started_at
+    title = f"Рассылка #{job.id} завершена." if finished else f"Рассылка #{job.id} выполняется..."
+    return (
+        f"{title}\n"
+        f"Обработано: {recorder.processed} из {job.total}\n"
+        f"Успешно отправлено: {recorder.success}\n"
+        f"Ошибок: {recorder.failed}\n"
+        f"Время выполнения: {elapsed:.0f} сек."
+    )
+
+
+async def edit_progress(bot: Bot, job: BroadcastJob, text: str):
+    """Обновляет сообщение с прогрессом рассылки"""
+    if not job.status_chat_id or not job.status_message_id:
+        return
+    try:
+        await bot.edit_message_text(text=text, chat_id=job.status_chat_id, message_id=job.status_message_id)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e).lower():
+            logger.warning(f"[BROADCAST] Не удалось обновить прогресс рассылки {job.id}: {e}")
+    except Exception as e:
+        logger.warning(f"[BROADCAST] Не удалось обновить прогресс рассылки {job.id}: {e}")
+
+
+async def report_progress(bot: Bot, job: BroadcastJob, recorder: DeliveryRecorder, started_at: float):
+    """Периодически сбрасывает результаты в БД и обновляет прогресс"""
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        await recorder.flush()
+        await edit_progress(bot, job, progress_text(job, recorder, started_at))
+
+
+async def run_job(bot: Bot, job: BroadcastJob):
+    """Выполняет (или продолжает) задачу рассылки"""
+    if job.cursor:
+        logger.info(f"[BROADCAST] Продолжаем рассылку #{job.id} с user_id>{job.cursor}")
+
+    recorder = DeliveryRecorder(job)
+    started_at = time.monotonic()
+    progress = asyncio.create_task(report_progress(bot, job, recorder, started_at))
+    status = None
+    try:
+        stats = await broadcast(
+            recipients=recorder.track(iter_job_recipients(job)),
+            send=build_sender(bot, job.payload),
+            bucket=broadcast_bucket,
+            workers=config.broadcast.workers,
+            on_result=recorder.record,
+        )
+        status = BroadcastStatus.done
+        logger.info(f"Рассылка #{job.id} завершена. Успешно: {stats.success}, Ошибок: {stats.failed}, Время: {stats.duration:.2f} сек.")
+    except Exception as e:
+        status = BroadcastStatus.failed
+        logger.error(f"Ошибка при выполнении рассылки #{job.id}: {e}", exc_info=True)
+    finally:
+        # При отмене (остановка бота) задача остаётся running и продолжится после рестарта
+        progress.cancel()
+        await recorder.flush()
+
+    await BroadcastORM.finish_job(job.id, status)
+    text = progress_text(job, recorder, started_at, finished=True)
+    if status == BroadcastStatus.failed:
+        text += "\n\nРассылка прервана из-за ошибки. Подробности в логах."
+    await edit_progress(bot, job, text)
+
+
+def start_job(bot: Bot, job: BroadcastJob) -> asyncio.Task:
+    """
+    Запускает задачу рассылки в фоне.
+    FSM админа задача не трогает: к её окончанию админ может готовить уже следующий черновик
+    """
+    # Пустой контекст: рассылка переживает апдейт и не должна работать в его сессии БД
+    task = asyncio.create_task(run_job(bot, job), context=contextvars.Context())
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+    return task
+
+
+async def resume_jobs(bot: Bot):
+    """Продолжает рассылки, прерванные рестартом бота"""
+    jobs = await BroadcastORM.get_running_jobs()
+    for job in jobs:
+        logger.info(f"[BROADCAST] Возобновляю рассылку #{job.id}")
+        start_job(bot, job)
@@ -2,19 +2,18 @@ import asyncio
 import json
 import logging
 import os
-import time
 
 from aiogram import F, Bot, Router, types
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, FSInputFile
-from aiogram.utils.media_group import MediaGroupBuilder
 from config_data.config import ConfigEnv, load_config
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
 from app.middlewares.album_middleware import AlbumMiddleware
+from app.sender.jobs import count_recipients, start_job
 from aiogram.fsm.storage.redis import Redis
 
-from db.ORM import DataBase
+from db.ORM import BroadcastORM
 
 logger = logging.getLogger(__name__)
 config: ConfigEnv = load_config()
@@ -30,17 +29,6 @@ class FSMFillForm(StatesGroup):
     SEND_type = State()
     SEND_ids = State()
     SEND_text = State()
-    SEND_process = State()
-
-@router.message(Command(commands="start_mailing"), StateFilter(FSMFillForm.SEND_process))
-async def start_mailing_process(message: types.Message):
-    if message.from_user.id not in admin_ids:
-        logger.warning(
-            f"Попытка несанкционированного доступа от пользователя {message.from_user.id}:{message.from_user.username}")
-        await message.reply("У вас нет прав для выполнения этой команды.")
-        return
-    await message.answer("Рассылка уже запущена")
-
 
 
 # Главная команда для начала рассылки
@@ -52,6 +40,11 @@ async def start_mailing(message: types.Message):
         await message.reply("У вас нет прав для выполнения этой команды.")
         return
 
+    # Рассылки идут в фоне и переживают рестарт — новую не начинаем, пока идёт предыдущая
+    if await BroadcastORM.get_running_jobs():
+        await message.answer("Рассылка уже запущена")
+        return
+
     logger.info(f"Начата новая рассылка администратором {message.from_user.id}:{message.from_user.username}")
     # Создаём кнопки
     button_1 = InlineKeyboardButton(text="Отправить избранным", callback_data="send_selected")
@@ -105,50 +98,21 @@ async def accept_photos(message: types.Message, bot: Bot, state: FSMContext, alb
         f"Получена медиагруппа от {message.from_user.id}:{message.from_user.username}. Количество файлов: {len(album)}")
 
     try:
-        # Собираем информацию о медиафайлах
-        media_messages = []
-
-        for msg in album:
-            media_info = {
-                'caption': msg.caption,
-                'media_group_id': msg.media_group_id
-            }
-
-            if msg.photo:
-                media_info['type'] = 'photo'
-                media_info['file_id'] = msg.photo[-1].file_id
-            elif msg.video:
-                media_info['type'] = 'video'
-                media_info['file_id'] = msg.video.file_id
-            elif msg.document:
-                media_info['type'] = 'document'
-                media_info['file_id'] = msg.document.file_id
-
-            media_messages.append(media_info)
-
-        # Сохраняем информацию о медиагруппе в состояние
-        await state.update_data(media_messages=media_messages)
-
-        # Создаем медиагруппу для предпросмотра
-        preview_group = MediaGroupBuilder(caption=media_messages[0].get('caption', None))
-
-        for media in media_messages:
-            preview_group.add(
-                type=media['type'],
-                media=media['file_id'],
-                caption=media.get('caption')
-            )
+        # Запоминаем только исходные сообщения — рассылка копирует их через copyMessages
+        message_ids = sorted(msg.message_id for msg in album)
+        await state.update_data(message_data={'from_chat_id': message.chat.id, 'message_ids': message_ids})
 
         # Отправляем предпросмотр
-        await message.answer_media_group(media=preview_group.build())
+        await bot.copy_messages(chat_id=message.chat.id, from_chat_id=message.chat.id, message_ids=message_ids)
 
         # Создаем кнопки подтверждения
-        btn_yes = InlineKeyboardButton(text="Да", callback_data="yes")
-        btn_no = InlineKeyboardButton(text="Нет", callback_data="no")
+        btn_yes = InlineKeyboardButton(text="Да", callback_data="SEND_yes")
+        btn_no = InlineKeyboardButton(text="Нет", callback_data="SEND_no")
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[btn_yes], [btn_no]])
 
         await message.answer(
             "Вы уверены, что хотите отправить эту медиагруппу?\n\n"
+            "Не удаляйте исходные сообщения до окончания рассылки — они копируются получателям.\n\n"
             "Выберите 'Да' для подтверждения или 'Нет' для отмены.",
             reply_markup=keyboard
         )
@@ -169,16 +133,8 @@ async def process_message(message: types.Message, state: FSMContext):
     try:
         await state.set_state(FSMFillForm.SEND_text)
 
-        # Сохраняем всю информацию о сообщении
-        message_data = {
-            'text': message.text,
-            'photo': message.photo[-1].file_id if message.photo else None,
-            'video': message.video.file_id if message.video else None,
-            'document': message.document.file_id if message.document else None,
-            'audio': message.audio.file_id if message.audio else None,
-            'voice': message.voice.file_id if message.voice else None,
-            'caption': message.caption,
-        }
+        # Запоминаем только исходное сообщение — рассылка копирует его через copyMessage
+        message_data = {'from_chat_id': message.chat.id, 'message_ids': [message.message_id]}
 
         await state.update_data(message_data=message_data)
 
@@ -199,40 +155,19 @@ async def process_message(message: types.Message, state: FSMContext):
         elif message.text:
             confirm_text += f"Текст: {message.text}"
 
+        elif message.voice:
+            confirm_text += "Голосовое сообщение"
+        elif message.audio:
+            confirm_text += "Аудио"
+
+        confirm_text += "\n\nНе удаляйте исходное сообщение до окончания рассылки — оно копируется получателям."
         confirm_text += "\n\nВыберите 'Да' для подтверждения или 'Нет' для отмены."
         btn_yes = InlineKeyboardButton(text="Да", callback_data="SEND_yes")
         btn_no = InlineKeyboardButton(text="Нет", callback_data="SEND_no")
         keyboard = InlineKeyboardMarkup(inline_keyboard=[[btn_yes], [btn_no]])
 
         # Отправляем пользователю его сообщение для предварительного просмотра
-
-        if message.photo:
-            await message.reply_photo(
-                photo=message.photo[-1].file_id,
-                caption=message.caption
-            )
-        elif message.video:
-            await message.reply_video(
-                video=message.video.file_id,
-                caption=message.caption
-            )
-        elif message.document:
-            await message.reply_document(
-                document=message.document.file_id,
-                caption=message.caption
-            )
-        elif message.audio:
-            await message.reply_audio(
-                audio=message.audio.file_id,
-                caption=message.caption
-            )
-        elif message.voice:
-            await message.reply_voice(
-                voice=message.voice.file_id,
-                caption=message.caption
-            )
-        elif message.text:
-            await message.reply(message.text)
+        await message.send_copy(chat_id=message.chat.id)
 
         await message.reply(confirm_text, reply_markup=keyboard)
         logger.debug(f"Сообщение успешно обработано и сохранено в состояние")
@@ -252,74 +187,36 @@ async def confirm_mailing(callback: types.CallbackQuery, state: FSMContext, bot:
         await state.clear()
         return
 
-    await state.set_state(FSMFillForm.SEND_process)
     logger.info(f"Начата рассылка от пользователя {callback.from_user.id}:{callback.from_user.username}")
     mailing_data = await state.get_data()
 
-    # Логируем тип рассылки и количество получателей
-    recipient_ids = []
+    total = await count_recipients(mailing_data["type"], mailing_data.get("ids"))
     if mailing_data["type"] == "send_all":
-        recipient_ids = await DataBase.get_all_user_ids()
-        logger.info(f"Тип рассылки: всем пользователям. Количество получателей: {len(recipient_ids)}")
+        logger.info(f"Тип рассылки: всем пользователям. Количество получателей: {total}")
     elif mailing_data["type"] == "send_selected":
-        recipient_ids = mailing_data["ids"]
-        logger.info(f"Тип рассылки: выбранным пользователям. Количество получателей: {len(recipient_ids)}")
+        logger.info(f"Тип рассылки: выбранным пользователям. Количество получателей: {total}")
     elif mailing_data["type"] == "exclude_ids":
-        all_ids = await DataBase.get_all_user_ids()
-        recipient_ids = [user_id for user_id in all_ids if user_id not in mailing_data["ids"]]
-        logger.info(f"Тип рассылки: всем кроме исключенных. Количество получателей: {len(recipient_ids)}")
-
-    await callback.message.answer(
-        f"Начата рассылка от пользователя {callback.from_user.id}:{callback.from_user.username}\nТип рассылки: всем пользователям. Количество получателей: {len(recipient_ids)}")
-
-    mailing_data = mailing_data['message_data']
-
-    success_count = 0
-    error_count = 0
-    start_time = time.time()
-    for user_id in recipient_ids:
-        try:
-            if 'media_messages' in mailing_data:
-                # Используем MediaGroupBuilder для медиагрупп
-                media_group = MediaGroupBuilder(caption=mailing_data['media_messages'][0].get('caption'))
-                for media in mailing_data['media_messages']:
-                    media_group.add(
-                        type=media['type'],
-                        media=media['file_id']
-                    )
-                await bot.send_media_group(user_id, media=media_group.build())
-            elif mailing_data.get('photo'):
-                await bot.send_photo(user_id, mailing_data['photo'], caption=mailing_data.get('caption'))
-            elif mailing_data.get('video'):
-                await bot.send_video(user_id, mailing_data['video'], caption=mailing_data.get('caption'))
-            elif mailing_data.get('document'):
-                await bot.send_document(user_id, mailing_data['document'], caption=mailing_data.get('caption'))
-            elif mailing_data.get('audio'):
-                await bot.send_audio(user_id, mailing_data['audio'], caption=mailing_data.get('caption'))
-            elif mailing_data.get('voice'):
-                await bot.send_voice(user_id, mailing_data['voice'], caption=mailing_data.get('caption'))
-            elif mailing_data.get('text'):
-                await bot.send_message(user_id, mailing_data['text'])
-            success_count += 1
-            logger.debug(f"Успешная отправка пользователю {user_id}")
-
-            await asyncio.sleep(0.5)
-        except Exception as e:
-            error_count += 1
-
-            logger.info(f"Ошибка при отправке пользователю {user_id}: {e}")
-
-    end_time = time.time()
-    duration = end_time - start_time
-
-    logger.info(f"Рассылка завершена. Успешно: {success_count}, Ошибок: {error_count}, Время: {duration:.2f} сек.")
-    await callback.message.answer(
-        f"Рассылка завершена.\n"
-        f"Успешно отправлено: {success_count}\n"
-        f"Ошибок: {error_count}\n"
-        f"Время выполнения: {duration:.2f} сек."
+        logger.info(f"Тип рассылки: всем кроме исключенных. Количество получателей: {total}")
+
+    # Это сообщение дальше редактируется — в нём показывается прогресс рассылки
+    status_message = await callback.message.answer(
+        f"Начата рассылка от пользователя {callback.from_user.id}:{callback.from_user.username}\nКоличество получателей: {total}")
+
+    job = await BroadcastORM.create_job(
+        admin_id=callback.from_user.id,
+        recipient_type=mailing_data["type"],
+        recipient_ids=mailing_data.get("ids"),
+        payload=mailing_data['message_data'],
+        total=total,
+        status_chat_id=status_message.chat.id,
+        status_message_id=status_message.message_id
     )
-    await state.clear()
-
-
+    if not job:
+        await callback.message.answer("Не удалось создать задачу рассылки. Попробуйте снова.")
+        await state.clear()
+        return
 
+    # Рассылка идёт в фоне, чтобы не держать обработчик колбэка часами.
+    # Черновик уже сохранён в задаче — FSM очищаем сразу
+    start_job(bot, job)
+    await state.clear()
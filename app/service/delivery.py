@@ -0,0 +1,27 @@
+"""
+Разбор результатов доставки сообщений пользователям.
+Заблокировавшие бота и удалённые аккаунты помечаются в БД и пропускаются при следующих отправках.
+"""
+from typing import Optional
+
+from aiogram.exceptions import TelegramForbiddenError
+
+from db.models import UserStatus
+
+
+def delivery_status(error: Optional[Exception]) -> Optional[UserStatus]:
+    """
+    Определяет статус пользователя по ошибке отправки
+
+    Returns:
+        UserStatus.blocked / UserStatus.deleted или None, если ошибка не про недоступность пользователя
+    """
+    if not isinstance(error, TelegramForbiddenError):
+        return None
+
+    error_msg = str(error).lower()
+    if "bot was blocked by the user" in error_msg:
+        return UserStatus.blocked
+    if "user is deactivated" in error_msg:
+        return UserStatus.deleted
+    return None
@@ -0,0 +1,199 @@
+"""
+Хранилище FSM в Redis: компактный формат данных, TTL и уборка брошенных ключей.
+
+Черновики объявлений и рассылок (file_id медиа, тексты до и после GPT) лежат в данных FSM
+и читаются/пишутся на каждом шаге диалога. Стандартный RedisStorage пишет их через json.dumps
+с экранированием кириллицы (\\uXXXX — 6 байт на букву) и без TTL, поэтому брошенные
+черновики остаются в Redis навсегда.
+
+- данные сериализуются выбранным форматом (FSM_SERIALIZER): msgpack (по умолчанию,
+  входит в зависимости), json без экранирования и пробелов или orjson (нужно установить
+  отдельно); старые значения в JSON читаются при любом формате. Неизвестный
+  или неустановленный формат — ошибка при запуске, а не тихий переход на json
+- состояние и данные живут FSM_STATE_TTL / FSM_DATA_TTL секунд после последнего изменения
+- уборщик (clean_fsm_storage) по расписанию считает ключи FSM и ставит TTL ключам,
+  записанным без него: простоявшие дольше TTL удаляет сразу, остальным — остаток TTL
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+from app.service.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+JSON = "json"
+ORJSON = "orjson"
+MSGPACK = "msgpack"
+
+# Сколько ключей уборщик обрабатывает за один SCAN
+SCAN_BATCH = 500
+
+data_bytes = Histogram(
+    "fsm_data_bytes",
+    "Размер сериализованных данных FSM при записи",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536),
+)
+evicted_keys = Counter("fsm_janitor_evicted_total", "Ключи FSM без TTL, удалённые уборщиком")
+
+
+@dataclass(frozen=True)
+class Serializer:
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def _json_serializer() -> Serializer:
+    return Serializer(
+        name=JSON,
+        dumps=lambda data: json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(),
+        loads=json.loads,
+    )
+
+
+def get_serializer(name: str) -> Serializer:
+    """
+    Сериализатор по имени из конфига. Неизвестный формат или неустановленный пакет —
+    ValueError: бот не запускается с настройкой, которую не может выполнить
+    """
+    if name == JSON:
+        return _json_serializer()
+    if name not in (ORJSON, MSGPACK):
+        raise ValueError(f"Неизвестный формат FSM_SERIALIZER={name}, допустимы: {JSON}, {ORJSON}, {MSGPACK}")
+    try:
+        if name == ORJSON:
+            import orjson
+            return Serializer(name=ORJSON, dumps=orjson.dumps, loads=orjson.loads)
+        import msgpack
+    except ImportError as e:
+        raise ValueError(f"FSM_SERIALIZER={name}, но пакет {name} не установлен") from e
+    return Serializer(
+        name=MSGPACK,
+        dumps=lambda data: msgpack.packb(data, use_bin_type=True),
+        loads=lambda raw: msgpack.unpackb(raw, raw=False),
+    )
+
+
+class CompactRedisStorage(RedisStorage):
+    """
+    RedisStorage с подключаемым форматом данных
+
+    Args:
+        redis: Клиент Redis
+        serializer: Формат данных FSM
+        **kwargs: Параметры RedisStorage (key_builder, state_ttl, data_ttl)
+    """
+
+    def __init__(self, redis, serializer: Serializer, **kwargs):
+        super().__init__(redis=redis, **kwargs)
+        self.serializer = serializer
+        # JSON (в том числе записанный до смены формата) всегда начинается с «{»
+        self._json_loads = serializer.loads if serializer.name != MSGPACK else json.loads
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+
+        redis_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(redis_key)
+            return
+        raw = self.serializer.dumps(data)
+        data_bytes.observe(len(raw))
+        await self.redis.set(redis_key, raw, ex=self.data_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        redis_key = self.key_builder.build(key, "data")
+        raw = await self.redis.get(redis_key)
+        if raw is None:
+            return {}
+        try:
+            if raw[:1] == b"{":
+                return self._json_loads(raw)
+            return self.serializer.loads(raw)
+        except Exception as e:
+            # Например, msgpack после переключения обратно на json — черновик теряется, диалог продолжается
+            logger.warning(f"[FSM] Не удалось прочитать данные {redis_key}, считаем их пустыми: {e}")
+            return {}
+
+
+def create_storage(redis, serializer: str, state_ttl: int, data_ttl: int) -> CompactRedisStorage:
+    """Хранилище FSM по настройкам из конфига (TTL 0 — бессрочно)"""
+    return CompactRedisStorage(
+        redis=redis,
+        serializer=get_serializer(serializer),
+        state_ttl=state_ttl or None,
+        data_ttl=data_ttl or None,
+    )
+
+
+async def clean_fsm_storage(storage: RedisStorage) -> dict[str, int]:
+    """
+    Проходит ключи FSM, ставит TTL ключам без него и удаляет простоявшие дольше TTL.
+    Возвращает сводку: сколько ключей, сколько было без TTL, сколько удалено
+    """
+    key_builder = storage.key_builder
+    prefix = key_builder.prefix if isinstance(key_builder, DefaultKeyBuilder) else "fsm"
+    separator = key_builder.separator if isinstance(key_builder, DefaultKeyBuilder) else ":"
+    limits = {"state": storage.state_ttl, "data": storage.data_ttl}
+    stats = {"keys": 0, "state": 0, "data": 0, "without_ttl": 0, "expire_set": 0, "evicted": 0}
+
+    batch = []
+    async for key in storage.redis.scan_iter(match=f"{prefix}{separator}*", count=SCAN_BATCH):
+        batch.append(key)
+        if len(batch) >= SCAN_BATCH:
+            await _clean_batch(storage.redis, batch, limits, separator, stats)
+            batch = []
+    if batch:
+        await _clean_batch(storage.redis, batch, limits, separator, stats)
+
+    evicted_keys.inc(stats["evicted"])
+    logger.info(
+        f"[FSM] Ключей FSM: {stats['keys']} (состояний {stats['state']}, данных {stats['data']}), "
+        f"без TTL: {stats['without_ttl']}, поставлен TTL: {stats['expire_set']}, удалено: {stats['evicted']}"
+    )
+    return stats
+
+
+async def _clean_batch(redis, keys: list, limits: dict, separator: str, stats: dict[str, int]):
+    """Проверяет пачку ключей двумя конвейерами: чтение TTL и простоя, затем уборка"""
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            # OBJECT и TTL не обновляют время последнего обращения к ключу
+            pipe.object("idletime", key)
+            pipe.ttl(key)
+        replies = await pipe.execute(raise_on_error=False)
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for index, key in enumerate(keys):
+            part = (key.decode() if isinstance(key, bytes) else key).rsplit(separator, 1)[-1]
+            if part not in limits:
+                continue  # блокировки изоляции событий живут по своему TTL
+            stats["keys"] += 1
+            stats[part] += 1
+
+            idle, ttl = replies[2 * index], replies[2 * index + 1]
+            if ttl != -1:
+                continue
+            stats["without_ttl"] += 1
+            limit = limits[part]
+            if not limit:
+                continue
+            limit = int(limit.total_seconds()) if hasattr(limit, "total_seconds") else int(limit)
+            # При политике вытеснения LFU простой недоступен — отсчитываем TTL заново
+            idle = idle if isinstance(idle, int) else 0
+            if idle >= limit:
+                pipe.delete(key)
+                stats["evicted"] += 1
+            else:
+                pipe.expire(key, limit - idle, nx=True)
+                stats["expire_set"] += 1
+        await pipe.execute(raise_on_error=False)
@@ -0,0 +1,92 @@
+"""
+Быстрая регистрация пользователей по /start.
+Уже зарегистрированные пользователи (с тем же username) запоминаются в памяти
+процесса и в Redis hash — повторный /start не обращается к Postgres.
+
+Удалённый пользователь убирается из hash при удалении (бот — DataBase.delete_user,
+админка — сигнал post_delete), а из памяти других процессов — по истечении L1_TTL.
+"""
+import logging
+import time
+from collections import OrderedDict
+
+from app.service.redis_client import redis
+from db.ORM import DataBase
+
+logger = logging.getLogger(__name__)
+
+KNOWN_USERS_KEY = "users:known"
+
+# Сколько секунд запись в памяти процесса считается актуальной без обращения к Redis
+L1_TTL = 300
+
+
+class KnownUsers:
+    """
+    user_id → user_name пользователей, которые точно есть в БД
+
+    Args:
+        maxsize: Сколько пользователей держать в памяти процесса
+        ttl: Сколько секунд запись в памяти актуальна без перепроверки в Redis
+    """
+
+    def __init__(self, maxsize: int = 100_000, ttl: float = L1_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # user_id -> (user_name, момент истечения по monotonic)
+        self._local: OrderedDict[int, tuple[str, float]] = OrderedDict()
+
+    def _put_local(self, user_id: int, user_name: str):
+        self._local[user_id] = (user_name, time.monotonic() + self.ttl)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    async def is_known(self, user_id: int, user_name: str) -> bool:
+        """Есть ли пользователь в БД с таким же username"""
+        entry = self._local.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            if entry[0] == user_name:
+                self._local.move_to_end(user_id)
+                return True
+        elif entry is not None:
+            del self._local[user_id]
+
+        try:
+            cached = await redis.hget(KNOWN_USERS_KEY, user_id)
+        except Exception as e:
+            logger.warning(f"[KNOWN_USERS] Ошибка чтения Redis: {e}")
+            return False
+        if cached is not None and redis.get_encoder().decode(cached, force=True) == user_name:
+            self._put_local(user_id, user_name)
+            return True
+        return False
+
+    async def remember(self, user_id: int, user_name: str):
+        """Запоминает пользователя после записи в БД"""
+        self._put_local(user_id, user_name)
+        try:
+            await redis.hset(KNOWN_USERS_KEY, user_id, user_name)
+        except Exception as e:
+            logger.warning(f"[KNOWN_USERS] Не удалось записать пользователя в Redis: {e}")
+
+    async def forget(self, user_id: int):
+        """Забывает пользователя после удаления из БД: следующий /start снова его зарегистрирует"""
+        self._local.pop(user_id, None)
+        try:
+            await redis.hdel(KNOWN_USERS_KEY, user_id)
+        except Exception as e:
+            logger.warning(f"[KNOWN_USERS] Не удалось удалить пользователя {user_id} из Redis: {e}")
+
+
+known_users = KnownUsers()
+
+
+async def register_user(user_id: int, user_name: str) -> bool:
+    """Регистрирует пользователя, если его ещё нет в БД или изменился username"""
+    if await known_users.is_known(user_id, user_name):
+        return True
+    if not await DataBase.insert_user(user_id, user_name):
+        return False
+    await known_users.remember(user_id, user_name)
+    return True
@@ -0,0 +1,97 @@
+"""
+L1-кэш в памяти процесса для короткоживущих флагов в Redis.
+
+Флаги вида «предупреждение уже отправлено» и «пользователь ограничен» живут секунды,
+а во время флуда в группе проверяются на каждом сообщении. Положительный ответ
+(флаг стоит) кэшируется локально до истечения TTL, и повторные проверки не ходят в Redis.
+Отсутствие флага локально не кэшируется: его мог поставить другой процесс бота,
+поэтому промах всегда проверяется в Redis — так L1 корректен при нескольких репликах.
+"""
+import logging
+import time
+from collections import OrderedDict
+
+from app.service.metrics import Counter
+from app.service.redis_client import THROTTLE, get_redis
+
+logger = logging.getLogger(__name__)
+redis = get_redis(THROTTLE)
+
+local_hits = Counter("flag_cache_local_hits_total", "Проверки флагов, отвеченные L1 без Redis")
+redis_requests = Counter("flag_cache_redis_requests_total", "Проверки флагов, ушедшие в Redis")
+
+# Ставит флаг, если его нет. Возвращает {поставлен этим вызовом (1/0), оставшийся TTL флага в мс}
+SET_ONCE_LUA = """
+if redis.call('SET', KEYS[1], '1', 'NX', 'PX', ARGV[1]) then
+    return {1, tonumber(ARGV[1])}
+end
+return {0, redis.call('PTTL', KEYS[1])}
+"""
+
+
+class LocalTTLCache:
+    """
+    Ключи с временем жизни в памяти процесса
+
+    Args:
+        maxsize: Сколько ключей держать, старые вытесняются первыми
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._expires: OrderedDict[str, float] = OrderedDict()
+
+    def ttl(self, key: str) -> float:
+        """Сколько секунд ключ ещё жив (0 — ключа нет)"""
+        expires = self._expires.get(key)
+        if expires is None:
+            return 0.0
+        left = expires - time.monotonic()
+        if left <= 0:
+            del self._expires[key]
+            return 0.0
+        return left
+
+    def set(self, key: str, ttl: float):
+        if ttl <= 0:
+            return
+        self._expires[key] = time.monotonic() + ttl
+        self._expires.move_to_end(key)
+        while len(self._expires) > self.maxsize:
+            self._expires.popitem(last=False)
+
+
+class FlagCache:
+    """
+    Флаги с TTL в Redis с L1 в памяти. Запись — сразу в Redis, одним запросом
+
+    Args:
+        maxsize: Сколько флагов держать в памяти процесса
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self._local = LocalTTLCache(maxsize)
+        self._set_once = redis.register_script(SET_ONCE_LUA)
+
+    async def set_once(self, key: str, ttl: float) -> bool:
+        """
+        Ставит флаг на ttl секунд, если его ещё нет.
+        True — флаг поставлен этим вызовом, и действие (например, предупреждение) нужно выполнить.
+        Если Redis недоступен, решает только L1.
+        """
+        if self._local.ttl(key):
+            local_hits.inc()
+            return False
+
+        redis_requests.inc()
+        try:
+            is_set, left_ms = await self._set_once(keys=[key], args=[int(ttl * 1000)])
+        except Exception as e:
+            logger.warning(f"[FLAGS] Ошибка Redis для {key}: {e}")
+            is_set, left_ms = 1, int(ttl * 1000)
+        # Если флаг поставил другой процесс, помним его до истечения в Redis
+        self._local.set(key, left_ms / 1000)
+        return bool(is_set)
+
+
+flags = FlagCache()
@@ -0,0 +1,87 @@
+"""
+Фоновая запись логов действий пользователей.
+Middleware только кладёт запись в очередь, а в БД логи уходят пачками
+одним multi-row INSERT — обработчики не ждут запись лога.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from db.ORM import LoggerORM
+
+logger = logging.getLogger(__name__)
+
+
+class LogWriter:
+    """
+    Очередь логов с периодическим сбросом в БД
+
+    Args:
+        batch_size: Сбрасывать, как только накопилось столько записей
+        flush_interval: Сбрасывать не реже, чем раз в столько секунд
+        max_queue: Размер очереди; когда она заполнена, put() ждёт (backpressure)
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 1.0, max_queue: int = 10_000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+    async def put(self, user_id: int, user_name: str, action: str, type: str):
+        """Добавляет лог в очередь. Ждёт только если очередь переполнена."""
+        await self.queue.put({
+            "timestamp": datetime.now(timezone.utc),
+            "user_id": user_id,
+            "user_name": user_name,
+            "action": action,
+            "type": type,
+        })
+
+    def start(self):
+        """Запускает фоновую запись"""
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую запись и сбрасывает остаток очереди"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        await self._flush(batch)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]):
+        if not batch:
+            return
+        if not await LoggerORM.create_logs(batch):
+            logger.warning(f"[LOG_WRITER] Потеряно {len(batch)} записей лога")
+
+
+log_writer = LogWriter()
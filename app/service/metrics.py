@@ -0,0 +1,137 @@
+"""
+Метрики бота в формате Prometheus.
+
+Метрики регистрируются в REGISTRY при создании и отдаются HTTP-эндпоинтом /metrics
+(METRICS_PORT), а краткая сводка периодически пишется в лог.
+Модуль не зависит от остального кода бота — его можно импортировать откуда угодно.
+"""
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+REGISTRY: list = []
+
+
+class Counter:
+    """Монотонно растущий счётчик"""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+    def summary(self) -> str:
+        return f"{self.name}={self.value}"
+
+
+class Gauge:
+    """Текущее значение, которое читается функцией в момент сбора"""
+
+    def __init__(self, name: str, help: str, func: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.func = func
+        REGISTRY.append(self)
+
+    def _value(self) -> Optional[float]:
+        try:
+            return self.func()
+        except Exception:
+            return None
+
+    def render(self) -> list[str]:
+        value = self._value()
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+    def summary(self) -> str:
+        return f"{self.name}={self._value()}"
+
+
+class Histogram:
+    """Распределение значений по корзинам (buckets — верхние границы)"""
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        REGISTRY.append(self)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает квантиль q"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def summary(self) -> str:
+        return f"{self.name}: count={self.count} p50<={self.quantile(0.5)} p99<={self.quantile(0.99)}"
+
+
+def render_metrics() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(port: int, host: str = "0.0.0.0") -> web.AppRunner:
+    """Запускает HTTP-эндпоинт /metrics"""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"[METRICS] Эндпоинт метрик: http://{host}:{port}/metrics")
+    return runner
+
+
+async def log_metrics(interval: float):
+    """Периодически пишет сводку метрик в лог"""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("[METRICS] " + "; ".join(metric.summary() for metric in REGISTRY))
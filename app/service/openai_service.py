@@ -1,11 +1,17 @@
 import logging
-from openai import AsyncOpenAI
+from functools import lru_cache
 from config_data.config import ConfigEnv, load_config
 
 config: ConfigEnv = load_config()
 logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI(api_key=config.openai.api_key)
+
+@lru_cache(maxsize=None)
+def get_client():
+    """Клиент OpenAI создаётся при первой генерации: импорт openai заметно замедляет старт бота"""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=config.openai.api_key)
 
 SYSTEM_PROMPT = """Ты — помощник по созданию объявлений о продаже автомобилей для Telegram-канала.
 
@@ -89,7 +95,7 @@ async def generate_post_text(
                 "content": full_text
             })
         
-        response = await client.chat.completions.create(
+        response = await get_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.7,
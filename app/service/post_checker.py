@@ -0,0 +1,214 @@
+"""
+Проверка, не удалены ли опубликованные посты из канала.
+
+Пост "пробуется" правкой reply_markup: существующее сообщение отвечает
+"message is not modified", удалённое — "message to edit not found".
+Пробы идут параллельно ограниченным пулом под общим token bucket.
+
+Пробы отправляет отдельный Bot со своей сессией, а не LimitedBot бота: лимит
+LimitedBot на чат (0.32 запроса/сек) общий с остальными отправками и растянул бы
+проход на часы. Темп проб задаёт только POST_CHECK_RATE. По умолчанию 0.3 пробы/сек —
+около 20 правок в минуту, предел Telegram для одного чата, поэтому проход
+не упирается в flood control; на RetryAfter все пробы встают на паузу.
+
+Посты проверяются не все подряд, а по расписанию next_check_at: свежие часто,
+старые всё реже (интервал растёт вдвое при каждом учетверении возраста поста).
+Каждый запуск берёт только посты, срок проверки которых наступил.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import EditMessageReplyMarkup
+
+from app.sender.broadcast import TokenBucket
+from config_data.config import ConfigEnv, load_config
+from db.ORM import PostsORM
+
+logger = logging.getLogger(__name__)
+config: ConfigEnv = load_config()
+
+# Ответы API, означающие, что сообщение существует
+EXISTS_ERRORS = ("message is not modified", "message can't be edited", "there is no reply markup")
+# Ответы API, означающие, что сообщение удалено
+DELETED_ERRORS = ("message to edit not found", "message not found")
+
+# Общий лимит проб к каналу
+post_check_bucket = TokenBucket(rate=config.post_check.rate)
+# Бот для проб — без лимитов LimitedBot, со своим пулом соединений
+checker_bot = Bot(token=config.tg_bot.token)
+
+# Колонки поста, нужные для проверки и планирования следующей
+CHECK_COLUMNS = ("id", "post_id", "post_message_ids", "date_published", "created_at")
+# Сколько результатов копить перед записью в БД
+FLUSH_SIZE = 500
+
+# Не даёт запуститься новой проверке, пока идёт предыдущая
+_check_lock = asyncio.Lock()
+
+
+def check_interval(age: timedelta) -> timedelta:
+    """
+    Интервал до следующей проверки поста возраста age:
+    min_interval для свежих постов, x2 на каждое учетверение возраста, но не больше max_interval
+    """
+    min_interval = config.post_check.min_interval * 60
+    max_interval = config.post_check.max_interval * 60
+    age_seconds = age.total_seconds()
+    if age_seconds <= min_interval:
+        return timedelta(seconds=min_interval)
+    step = int(math.log2(age_seconds / min_interval)) // 2
+    return timedelta(seconds=min(min_interval * 2 ** step, max_interval))
+
+
+@dataclass
+class PostCheckStats:
+    """Итоги прохода проверки постов"""
+    total: int = 0
+    checked: int = 0
+    deleted: int = 0
+    retries: int = 0
+    errors: Counter = field(default_factory=Counter)
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def probes_per_second(self) -> float:
+        probes = self.checked + self.deleted + sum(self.errors.values())
+        return probes / self.duration if self.duration else 0.0
+
+
+async def probe_post(bot: Bot, message_id: int, stats: PostCheckStats, max_retries: int = 3) -> Optional[bool]:
+    """
+    Проверяет, существует ли сообщение в канале
+
+    Returns:
+        True — существует, False — удалено, None — не удалось проверить
+    """
+    method = EditMessageReplyMarkup(chat_id=config.tg_bot.channel_id, message_id=message_id, reply_markup=None)
+    for attempt in range(max_retries + 1):
+        await post_check_bucket.acquire()
+        try:
+            await bot(method)
+            return True
+        except TelegramRetryAfter as e:
+            logger.warning(f"[CHECK_POSTS] Flood control, пауза {e.retry_after} сек.")
+            post_check_bucket.pause(e.retry_after)
+            stats.retries += 1
+            if attempt == max_retries:
+                stats.errors[type(e).__name__] += 1
+                return None
+        except TelegramBadRequest as e:
+            error_msg = str(e).lower()
+            if any(text in error_msg for text in DELETED_ERRORS):
+                return False
+            if any(text in error_msg for text in EXISTS_ERRORS):
+                return True
+            logger.warning(f"[CHECK_POSTS] Ошибка проверки сообщения {message_id}: {e}")
+            stats.errors[type(e).__name__] += 1
+            return None
+        except Exception as e:
+            logger.warning(f"[CHECK_POSTS] Неизвестная ошибка для сообщения {message_id}: {e}")
+            stats.errors[type(e).__name__] += 1
+            return None
+
+
+async def check_deleted_posts(bot: Bot = checker_bot) -> Optional[PostCheckStats]:
+    """
+    Проверяет существуют ли в канале посты, срок проверки которых наступил.
+    Если пост удалён — помечает его в БД, иначе назначает следующую проверку.
+    """
+    if _check_lock.locked():
+        logger.warning("[CHECK_POSTS] Предыдущая проверка ещё идёт, пропускаю запуск")
+        return None
+
+    async with _check_lock:
+        logger.info("[CHECK_POSTS] Начинаю проверку постов на удаление...")
+        stats = PostCheckStats()
+        try:
+            queue: asyncio.Queue = asyncio.Queue(maxsize=config.post_check.workers * 2)
+            deleted_ids = []
+            schedule = []
+
+            async def produce():
+                try:
+                    async for post in PostsORM.iter_due_posts(
+                        limit=config.post_check.batch_size, columns=CHECK_COLUMNS
+                    ):
+                        stats.total += 1
+                        await queue.put(post)
+                finally:
+                    # Сигнал остановки каждому воркеру
+                    for _ in range(config.post_check.workers):
+                        await queue.put(None)
+
+            async def work():
+                while True:
+                    post = await queue.get()
+                    if post is None:
+                        return
+                    exists = await probe_post(bot, post.post_id, stats)
+                    if exists:
+                        stats.checked += 1
+                        now = datetime.now(timezone.utc)
+                        published_at = post.date_published or post.created_at or now
+                        schedule.append({
+                            "id": post.id,
+                            "last_checked_at": now,
+                            "next_check_at": now + check_interval(now - published_at),
+                        })
+                    elif exists is False:
+                        deleted_ids.append(post.id)
+                        stats.deleted += 1
+                        logger.info(f"[CHECK_POSTS] Пост ID={post.id} (TG: {post.post_id}) удалён из канала")
+
+                    # Результаты пишутся пачками по ходу прохода, а не копятся до конца
+                    if len(schedule) >= FLUSH_SIZE:
+                        batch, schedule[:] = schedule[:], []
+                        await PostsORM.schedule_checks(batch)
+                    if len(deleted_ids) >= FLUSH_SIZE:
+                        batch, deleted_ids[:] = deleted_ids[:], []
+                        await PostsORM.mark_posts_as_deleted(batch)
+
+            producer = asyncio.create_task(produce())
+            try:
+                await asyncio.gather(*(work() for _ in range(config.post_check.workers)))
+                await producer
+            finally:
+                producer.cancel()
+
+            # Посты, которые не удалось проверить, останутся в очереди до следующего запуска
+            await PostsORM.schedule_checks(schedule)
+            # Помечаем удалённые посты
+            if deleted_ids:
+                await PostsORM.mark_posts_as_deleted(deleted_ids)
+            if stats.deleted:
+                logger.info(f"[CHECK_POSTS] Помечено как удалённые: {stats.deleted} постов")
+        except Exception as e:
+            logger.error(f"[CHECK_POSTS] Ошибка при проверке постов: {e}")
+        finally:
+            stats.finished_at = time.monotonic()
+
+        errors = ", ".join(f"{name}={count}" for name, count in stats.errors.items()) or "нет"
+        logger.info(
+            f"[CHECK_POSTS] Проверка завершена за {stats.duration:.1f} сек. "
+            f"Проверено: {stats.checked}, удалено: {stats.deleted}, из {stats.total}. "
+            f"Скорость: {stats.probes_per_second:.1f} проб/сек. Повторы: {stats.retries}. Ошибки API: {errors}"
+        )
+        return stats
+
+
+async def close_checker_bot():
+    """Закрывает сессию бота проб — при остановке бота"""
+    await checker_bot.session.close()
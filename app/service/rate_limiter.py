@@ -0,0 +1,160 @@
+"""
+Ограничение частоты действий пользователей в Redis.
+
+Проверка и учёт действия — один Lua-скрипт, то есть один запрос к Redis и никаких
+гонок между чтением и записью. Ключ — пользователь и класс действия
+(`ratelimit:{action}:{user_id}`), а не текст сообщения, поэтому число ключей
+не растёт от разных сообщений одного пользователя.
+
+- sliding window: не больше limit действий за любые window секунд (sorted set отметок)
+- token bucket: запас limit действий, восполняется равномерно за window секунд (hash)
+
+Время берётся из Redis (TIME), чтобы несколько процессов бота считали одинаково.
+Отказ запоминается в L1 до retry_after: пока пользователь ограничен, его повторные
+действия отклоняются без запроса к Redis. Лимиты — RATE_LIMIT_* в конфиге.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+
+from app.service.local_cache import LocalTTLCache
+from app.service.redis_client import THROTTLE, get_redis
+from config_data.config import ConfigEnv, load_config
+
+logger = logging.getLogger(__name__)
+config: ConfigEnv = load_config()
+redis = get_redis(THROTTLE)
+
+SLIDING_WINDOW = "sliding_window"
+TOKEN_BUCKET = "token_bucket"
+
+# KEYS[1] — ключ; ARGV: limit, window (мс), уникальная отметка действия
+# Возвращает {разрешено (1/0), через сколько мс повторить}
+SLIDING_WINDOW_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return {1, 0}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, tonumber(oldest[2]) + window - now}
+"""
+
+# KEYS[1] — ключ; ARGV: limit (ёмкость), window (мс, за сколько восполняется вся ёмкость)
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local rate = limit / window
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local ts = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + (now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], window)
+return {allowed, retry}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    limit: int  # сколько действий
+    window: float  # за сколько секунд
+    algorithm: str = SLIDING_WINDOW
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    retry_after: float = 0.0  # через сколько секунд действие будет разрешено
+
+
+# Лимиты по классам действий
+ACTION_LIMITS = {
+    # Команды (/start, /info, /select_language)
+    "command": RateLimit(limit=config.rate_limits.command, window=config.rate_limits.command_window),
+    # Нажатия inline-кнопок
+    "callback": RateLimit(limit=config.rate_limits.callback, window=config.rate_limits.callback_window),
+    # Сообщения в топик: запас на серию (альбом — одно действие), дальше — равномерно
+    "message": RateLimit(
+        limit=config.rate_limits.message,
+        window=config.rate_limits.message_window,
+        algorithm=TOKEN_BUCKET,
+    ),
+}
+
+
+class RateLimiter:
+    """
+    Лимиты действий пользователей по классам
+
+    Args:
+        limits: Класс действия → RateLimit
+    """
+
+    def __init__(self, limits: dict[str, RateLimit]):
+        self.limits = limits
+        # Ключи пользователей, которые сейчас ограничены
+        self._blocked = LocalTTLCache()
+        self._scripts = {
+            SLIDING_WINDOW: redis.register_script(SLIDING_WINDOW_LUA),
+            TOKEN_BUCKET: redis.register_script(TOKEN_BUCKET_LUA),
+        }
+
+    async def hit(self, user_id: int, action: str) -> RateLimitResult:
+        """
+        Учитывает действие пользователя и сообщает, разрешено ли оно.
+        Если Redis недоступен, действие разрешается.
+        """
+        rate_limit = self.limits[action]
+        key = f"ratelimit:{action}:{user_id}"
+        blocked = self._blocked.ttl(key)
+        if blocked:
+            return RateLimitResult(allowed=False, retry_after=blocked)
+
+        args = [rate_limit.limit, int(rate_limit.window * 1000)]
+        if rate_limit.algorithm == SLIDING_WINDOW:
+            args.append(uuid.uuid4().hex)
+
+        try:
+            allowed, retry_ms = await self._scripts[rate_limit.algorithm](keys=[key], args=args)
+        except Exception as e:
+            logger.warning(f"[RATE_LIMIT] Ошибка Redis, действие {action} пользователя {user_id} разрешено: {e}")
+            return RateLimitResult(allowed=True)
+
+        if allowed:
+            return RateLimitResult(allowed=True)
+        self._blocked.set(key, retry_ms / 1000)
+        logger.info(f"[RATE_LIMIT] {action} пользователя {user_id} ограничено, повтор через {retry_ms / 1000:.1f} с")
+        return RateLimitResult(allowed=False, retry_after=retry_ms / 1000)
+
+    async def wait(self, user_id: int, action: str, max_wait: float) -> RateLimitResult:
+        """
+        Как hit, но действие сверх лимита не отклоняется сразу, а ждёт своей очереди
+        до max_wait секунд. Отказ — только если ждать пришлось бы дольше
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            result = await self.hit(user_id, action)
+            if result.allowed or time.monotonic() + result.retry_after > deadline:
+                return result
+            await asyncio.sleep(max(result.retry_after, 0.05))
+
+
+rate_limiter = RateLimiter(ACTION_LIMITS)
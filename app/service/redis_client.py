@@ -1,14 +1,142 @@
 """
-Модуль для инициализации Redis клиента.
-Используется для избежания циклических импортов.
+Фабрика клиентов Redis.
+
+У каждого потребителя (FSM, кэши, лимиты, блокировки, ожидание блокировок) свой клиент
+со своим пулом: подписки ожидающих и всплеск лимитов во время флуда не занимают
+соединения, нужные FSM и освобождению блокировок. Настройки пулов общие — REDIS_* в конфиге:
+
+- пул ограничен REDIS_MAX_CONNECTIONS, при исчерпании команда ждёт свободное
+  соединение REDIS_POOL_TIMEOUT секунд, а не открывает новые без предела
+- таймауты подключения и ответа, PING простоявших соединений
+- повтор команды с экспоненциальной задержкой при обрыве соединения или таймауте —
+  кроме лимитов и блокировок: их скрипты меняют данные, и повтор после потерянного
+  ответа учёл бы действие дважды или принял свою блокировку за чужую
+
+Время команд и занятость пулов отдаются в /metrics (redis_{name}_*).
+Модуль также используется для избежания циклических импортов.
 """
+import asyncio
+import time
+
+from redis.asyncio import BlockingConnectionPool
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff, NoBackoff
+from redis.exceptions import ConnectionError, TimeoutError
 from aiogram.fsm.storage.redis import Redis
+
+from app.service.metrics import Counter, Gauge, Histogram
 from config_data.config import ConfigEnv, load_config
 
 config: ConfigEnv = load_config()
 
-redis = Redis(
-    host=config.redis.host,
-    port=config.redis.port,
-    password=config.redis.password
-)
+# Потребители Redis, у каждого свой пул
+FSM = "fsm"
+CACHE = "cache"
+THROTTLE = "throttle"
+LOCKS = "locks"
+LOCK_WAITS = "lock_waits"
+
+# Потребители, команды которых не повторяются при ошибке соединения
+NO_RETRY = frozenset({THROTTLE, LOCKS})
+
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+Gauge("redis_pool_max_connections", "Предельный размер пула каждого клиента Redis",
+      lambda: config.redis.max_connections)
+
+
+def connection_kwargs() -> dict:
+    """Параметры соединений из конфига — общие для всех пулов"""
+    return {
+        "host": config.redis.host,
+        "port": config.redis.port,
+        "password": config.redis.password,
+        "socket_timeout": config.redis.socket_timeout,
+        "socket_connect_timeout": config.redis.connect_timeout,
+        "health_check_interval": config.redis.health_check_interval,
+    }
+
+
+def retry_policy(name: str) -> Retry:
+    """Повторы команд потребителя name: для NO_RETRY — одна попытка"""
+    if name in NO_RETRY:
+        return Retry(NoBackoff(), 0)
+    return Retry(ExponentialBackoff(cap=1.0, base=0.05), config.redis.retries,
+                 supported_errors=(ConnectionError, TimeoutError))
+
+
+class InstrumentedPool(BlockingConnectionPool):
+    """Пул соединений, который считает таймауты ожидания свободного соединения"""
+
+    timeouts: Counter
+
+    async def get_connection(self, *args, **kwargs):
+        try:
+            return await super().get_connection(*args, **kwargs)
+        except ConnectionError as e:
+            # Пул исчерпан дольше pool_timeout
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                self.timeouts.inc()
+            raise
+
+
+class InstrumentedRedis(Redis):
+    """Клиент Redis, который замеряет время команд (включая повторы и ожидание пула)"""
+
+    command_seconds: Histogram
+    command_errors: Counter
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except (ConnectionError, TimeoutError):
+            self.command_errors.inc()
+            raise
+        finally:
+            self.command_seconds.observe(time.perf_counter() - started)
+
+
+_clients: dict[str, InstrumentedRedis] = {}
+
+
+def get_redis(name: str) -> InstrumentedRedis:
+    """
+    Клиент Redis потребителя name со своим пулом. Повторные вызовы возвращают тот же клиент
+
+    Args:
+        name: Потребитель — FSM, CACHE, THROTTLE, LOCKS, LOCK_WAITS
+    """
+    if name in _clients:
+        return _clients[name]
+
+    pool = InstrumentedPool(
+        max_connections=config.redis.max_connections,
+        timeout=config.redis.pool_timeout,
+        retry=retry_policy(name),
+        client_name=f"bot:{name}",
+        **connection_kwargs(),
+    )
+    pool.timeouts = Counter(f"redis_{name}_pool_timeouts_total",
+                            f"Таймауты ожидания свободного соединения в пуле Redis {name}")
+    Gauge(f"redis_{name}_pool_in_use", f"Соединения пула Redis {name}, занятые командами и подписками",
+          lambda: len(pool._in_use_connections))
+    Gauge(f"redis_{name}_pool_available", f"Открытые свободные соединения пула Redis {name}",
+          lambda: len(pool._available_connections))
+
+    client = InstrumentedRedis(connection_pool=pool)
+    client.command_seconds = Histogram(f"redis_{name}_command_seconds",
+                                       f"Время команд Redis {name}", buckets=COMMAND_BUCKETS)
+    client.command_errors = Counter(f"redis_{name}_command_errors_total",
+                                    f"Команды Redis {name}, не выполненные из-за соединения или таймаута")
+    _clients[name] = client
+    return client
+
+
+async def close_redis():
+    """Закрывает соединения всех пулов — при остановке бота"""
+    await asyncio.gather(*(client.connection_pool.disconnect() for client in _clients.values()))
+
+
+# Клиент кэшей — по умолчанию для прочих модулей
+redis = get_redis(CACHE)
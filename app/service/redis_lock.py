@@ -0,0 +1,146 @@
+"""
+Распределённая блокировка в Redis с ожиданием освобождения.
+
+- захват: SET NX PX с уникальным токеном владельца — атомарно, истекает сама,
+  если владелец упал
+- освобождение: Lua-скрипт удаляет ключ только при совпадении токена (чужую
+  блокировку, захваченную после истечения нашей, не снимет) и публикует
+  в канал блокировки результат работы владельца
+- ожидание: вместо опроса с sleep ожидающие подписываются на канал и просыпаются
+  сразу после освобождения. Подписка держит соединение всё время ожидания, поэтому
+  подписки берут соединения из своего пула (LOCK_WAITS): сколько бы ни ждало, захват,
+  освобождение и проверка ключа не останутся без соединений
+- продление: пока владелец работает, keep_alive() каждую треть TTL продлевает
+  блокировку (тем же сравнением токена), поэтому долгая работа — например, создание
+  топика в очереди лимитов Telegram — не отдаёт блокировку следующему
+- захват, продление и освобождение не повторяются при ошибке соединения (см. redis_client)
+"""
+import asyncio
+import logging
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from redis.exceptions import RedisError
+
+from app.service.redis_client import LOCK_WAITS, LOCKS, get_redis
+
+logger = logging.getLogger(__name__)
+redis = get_redis(LOCKS)
+waits_redis = get_redis(LOCK_WAITS)
+
+# KEYS: ключ блокировки, канал; ARGV: токен владельца, результат для ожидающих
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('PUBLISH', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# KEYS: ключ блокировки; ARGV: токен владельца, новый TTL (мс)
+EXTEND_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_release_script = redis.register_script(RELEASE_LUA)
+_extend_script = redis.register_script(EXTEND_LUA)
+
+
+class RedisLock:
+    """
+    Блокировка одного ресурса
+
+    Args:
+        name: Имя ресурса, например create_topic:{user_id}
+        ttl: Через сколько секунд блокировка истечёт, если её не освободили
+    """
+
+    def __init__(self, name: str, ttl: float = 10.0):
+        self.key = f"lock:{name}"
+        self.channel = f"lock:{name}:released"
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+
+    async def acquire(self) -> bool:
+        """Пытается захватить блокировку, не ожидая. True — захвачена этим объектом"""
+        return bool(await redis.set(self.key, self.token, nx=True, px=int(self.ttl * 1000)))
+
+    async def release(self, result: str = "") -> bool:
+        """
+        Освобождает блокировку, если ею всё ещё владеет этот объект,
+        и передаёт ожидающим result. False — блокировка уже истекла
+        """
+        try:
+            released = await _release_script(keys=[self.key, self.channel], args=[self.token, result])
+        except RedisError as e:
+            # Скрипт не повторяем: блокировка истечёт по TTL, ожидающие перепроверят ключ
+            logger.error(f"[LOCK] Не удалось освободить {self.key}: {e}")
+            return False
+        if not released:
+            logger.warning(f"[LOCK] {self.key} истекла до освобождения")
+        return bool(released)
+
+    async def extend(self) -> bool:
+        """Продлевает блокировку на ttl, если ею всё ещё владеет этот объект"""
+        try:
+            return bool(await _extend_script(keys=[self.key], args=[self.token, int(self.ttl * 1000)]))
+        except RedisError as e:
+            logger.warning(f"[LOCK] Не удалось продлить {self.key}: {e}")
+            return False
+
+    @asynccontextmanager
+    async def keep_alive(self) -> AsyncIterator[None]:
+        """Продлевает захваченную блокировку, пока выполняется тело блока"""
+
+        async def refresh():
+            while True:
+                await asyncio.sleep(self.ttl / 3)
+                if not await self.extend():
+                    logger.warning(f"[LOCK] {self.key} не продлена, её может захватить другой владелец")
+
+        task = asyncio.create_task(refresh())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Ждёт освобождения блокировки другим владельцем; без timeout — пока блокировка
+        существует (владелец продлевает её, пока работает).
+        Возвращает его result; None — блокировка истекла без освобождения, вышел timeout
+        или Redis недоступен (в том числе заняты все соединения ожидающих)
+        """
+        deadline = math.inf if timeout is None else time.monotonic() + timeout
+        pubsub = waits_redis.pubsub()
+        try:
+            # Подписываемся до проверки ключа, чтобы не пропустить освобождение между ними
+            await pubsub.subscribe(self.channel)
+            while True:
+                # -2 — ключа нет: блокировку освободили или она истекла
+                lock_ttl = await redis.pttl(self.key)
+                left = deadline - time.monotonic()
+                if lock_ttl == -2 or left <= 0:
+                    return None
+                # Истечение по TTL не публикуется, поэтому ждём не дольше оставшегося TTL и перепроверяем ключ
+                wait_for = min(left, lock_ttl / 1000 if lock_ttl > 0 else 1.0)
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=wait_for)
+                if message is not None:
+                    data = message["data"]
+                    return data.decode() if isinstance(data, bytes) else data
+        except RedisError as e:
+            logger.warning(f"[LOCK] Ожидание {self.key} прервано: {e}")
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe(self.channel)
+                await pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"[LOCK] Ошибка закрытия подписки {self.channel}: {e}")
@@ -0,0 +1,114 @@
+"""
+Пул свободных топиков в группе модерации.
+
+Создание топика и карточки пользователя — два запроса к Telegram, которые иначе
+стоят на пути первого сообщения нового пользователя и упираются в лимиты группы
+во время наплыва. Фоновая задача заранее создаёт SPARE_TOPICS_SIZE топиков
+с сообщением-заглушкой, новому пользователю топик отдаётся переименованием
+и правкой заглушки в карточку (параллельно), а пул пополняется в фоне.
+"""
+import asyncio
+import contextvars
+import logging
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from config_data.config import ConfigEnv, load_config
+from db.ORM import SpareTopicORM
+
+logger = logging.getLogger(__name__)
+config: ConfigEnv = load_config()
+
+SPARE_TOPIC_NAME = "⏳ Свободный топик"
+SPARE_INTRO_TEXT = "Топик зарезервирован для нового обращения"
+
+# Пополнение идёт одно за раз — из планировщика или после выдачи топика
+_refill_lock = asyncio.Lock()
+_refill_tasks: set[asyncio.Task] = set()
+
+
+async def refill_spare_topics(bot: Bot) -> int:
+    """Досоздаёт свободные топики до SPARE_TOPICS_SIZE. Возвращает, сколько создано"""
+    if _refill_lock.locked():
+        return 0
+    async with _refill_lock:
+        group_id = config.tg_bot.tg_message_group_id
+        created = 0
+        # Пересчитываем после каждого топика: пока идёт пополнение, топики продолжают выдавать
+        while True:
+            count = await SpareTopicORM.count_topics()
+            if count is None or count >= config.spare_topics.size:
+                break
+            try:
+                topic = await bot.create_forum_topic(chat_id=group_id, name=SPARE_TOPIC_NAME)
+                intro = await bot.send_message(
+                    chat_id=group_id,
+                    message_thread_id=topic.message_thread_id,
+                    text=SPARE_INTRO_TEXT
+                )
+            except TelegramRetryAfter as e:
+                # Лимит группы — остальное досоздаст следующий запуск
+                logger.warning(f"[SPARE_TOPICS] Лимит Telegram, пополнение отложено на {e.retry_after} с")
+                break
+            except Exception as e:
+                logger.error(f"[SPARE_TOPICS] Ошибка создания свободного топика: {e}")
+                break
+            if not await SpareTopicORM.add_topic(topic.message_thread_id, intro.message_id):
+                break
+            created += 1
+
+        if created:
+            logger.info(f"[SPARE_TOPICS] Создано свободных топиков: {created}")
+        return created
+
+
+def schedule_refill(bot: Bot):
+    """Запускает пополнение пула в фоне, не задерживая обработку апдейта"""
+    # Пустой контекст: пополнение переживает апдейт и не должно работать в его сессии БД
+    task = asyncio.create_task(refill_spare_topics(bot), context=contextvars.Context())
+    _refill_tasks.add(task)
+    task.add_done_callback(_refill_tasks.discard)
+
+
+async def assign_spare_topic(bot: Bot, name: str, intro_text: str) -> Optional[int]:
+    """
+    Отдаёт свободный топик: переименовывает его и превращает заглушку в карточку пользователя.
+    Возвращает thread_id или None, если пул пуст или топик не удалось оформить
+    """
+    if config.spare_topics.size <= 0:
+        return None
+
+    spare = await SpareTopicORM.take_topic()
+    schedule_refill(bot)
+    if spare is None:
+        return None
+
+    thread_id, intro_message_id = spare
+    group_id = config.tg_bot.tg_message_group_id
+    try:
+        await asyncio.gather(
+            bot.edit_forum_topic(chat_id=group_id, message_thread_id=thread_id, name=name),
+            bot.edit_message_text(chat_id=group_id, message_id=intro_message_id, text=intro_text),
+        )
+    except TelegramBadRequest as e:
+        # Топик удалили из группы вручную — убираем остатки, топик создастся обычным путём
+        logger.warning(f"[SPARE_TOPICS] Свободный топик {thread_id} не удалось выдать: {e}")
+        await _delete_topic(bot, thread_id)
+        return None
+    except Exception as e:
+        # Сеть, лимит или ошибка Telegram: топик цел — возвращаем его в пул, следующая выдача
+        # оформит его заново. Если вернуть не вышло, удаляем, чтобы он не висел в группе ничьим
+        logger.warning(f"[SPARE_TOPICS] Свободный топик {thread_id} не удалось выдать, возвращаем в пул: {e}")
+        if not await SpareTopicORM.add_topic(thread_id, intro_message_id):
+            await _delete_topic(bot, thread_id)
+        return None
+    return thread_id
+
+
+async def _delete_topic(bot: Bot, thread_id: int):
+    try:
+        await bot.delete_forum_topic(chat_id=config.tg_bot.tg_message_group_id, message_thread_id=thread_id)
+    except Exception as e:
+        logger.error(f"[SPARE_TOPICS] Не удалось удалить топик {thread_id}: {e}")
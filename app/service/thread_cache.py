@@ -0,0 +1,160 @@
+"""
+Кэш соответствия user_id ↔ thread_id топиков в группе модерации.
+
+- L1: ограниченный LRU в памяти процесса в обе стороны, записи живут L1_TTL секунд:
+  топик, забытый другим процессом бота, перечитывается из Redis не позже чем через L1_TTL
+- L2: два Redis hash (user → thread и thread → user), переживают рестарт бота
+- источник истины — таблица user_threads
+
+Записи добавляются при создании топика и удаляются, когда топик пропал из группы.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.service.redis_client import redis
+from db.ORM import ThreadORM
+
+logger = logging.getLogger(__name__)
+
+USER_TO_THREAD_KEY = "threads:user_to_thread"
+THREAD_TO_USER_KEY = "threads:thread_to_user"
+
+# Сколько секунд запись L1 считается актуальной без обращения к Redis
+L1_TTL = 300
+
+# Удаляет пару, только если она всё ещё указывает на забываемый топик:
+# новый топик пользователя, записанный другим процессом, не трогаем
+# KEYS: user → thread, thread → user; ARGV: user_id, thread_id
+INVALIDATE_LUA = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+if redis.call('HGET', KEYS[2], ARGV[2]) == ARGV[1] then
+    redis.call('HDEL', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+
+class ThreadCache:
+    """
+    Двусторонний кэш user_id ↔ thread_id
+
+    Args:
+        maxsize: Сколько пар держать в памяти процесса
+        ttl: Сколько секунд пара в памяти актуальна без перепроверки в Redis
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = L1_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # user_id -> (thread_id, момент истечения по monotonic)
+        self._by_user: OrderedDict[int, tuple[int, float]] = OrderedDict()
+        self._by_thread: dict[int, int] = {}
+        self._invalidate = redis.register_script(INVALIDATE_LUA)
+
+    def _put_local(self, user_id: int, thread_id: int):
+        self._drop_local(user_id, thread_id)
+        self._by_user[user_id] = (thread_id, time.monotonic() + self.ttl)
+        self._by_thread[thread_id] = user_id
+        while len(self._by_user) > self.maxsize:
+            _, (old_thread_id, _) = self._by_user.popitem(last=False)
+            self._by_thread.pop(old_thread_id, None)
+
+    def _get_local(self, user_id: int) -> Optional[int]:
+        entry = self._by_user.get(user_id)
+        if entry is None:
+            return None
+        thread_id, expires = entry
+        if expires <= time.monotonic():
+            self._drop_local(user_id, thread_id)
+            return None
+        self._by_user.move_to_end(user_id)
+        return thread_id
+
+    def _drop_local(self, user_id: Optional[int], thread_id: Optional[int]):
+        old_entry = self._by_user.pop(user_id, None)
+        old_user_id = self._by_thread.pop(thread_id, None)
+        if old_entry is not None:
+            self._by_thread.pop(old_entry[0], None)
+        self._by_user.pop(old_user_id, None)
+
+    async def _put_redis(self, pairs: dict[int, int]):
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hset(USER_TO_THREAD_KEY, mapping=pairs)
+                pipe.hset(THREAD_TO_USER_KEY, mapping={thread_id: user_id for user_id, thread_id in pairs.items()})
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"[THREAD_CACHE] Не удалось записать топики в Redis: {e}")
+
+    async def get_thread_id(self, user_id: int) -> Optional[int]:
+        """thread_id топика пользователя или None, если топика нет"""
+        thread_id = self._get_local(user_id)
+        if thread_id is not None:
+            return thread_id
+
+        try:
+            cached = await redis.hget(USER_TO_THREAD_KEY, user_id)
+        except Exception as e:
+            logger.warning(f"[THREAD_CACHE] Ошибка чтения Redis: {e}")
+            cached = None
+        if cached is not None:
+            thread_id = int(cached)
+            self._put_local(user_id, thread_id)
+            return thread_id
+
+        thread_id = await ThreadORM.get_thread_id(user_id)
+        if thread_id is not None:
+            await self.remember(user_id, thread_id)
+        return thread_id
+
+    async def get_user_id(self, thread_id: int) -> Optional[int]:
+        """user_id владельца топика или None"""
+        user_id = self._by_thread.get(thread_id)
+        if user_id is not None and self._get_local(user_id) == thread_id:
+            return user_id
+
+        try:
+            cached = await redis.hget(THREAD_TO_USER_KEY, thread_id)
+        except Exception as e:
+            logger.warning(f"[THREAD_CACHE] Ошибка чтения Redis: {e}")
+            cached = None
+        if cached is not None:
+            user_id = int(cached)
+            self._put_local(user_id, thread_id)
+            return user_id
+
+        user_id = await ThreadORM.get_user_by_thread_id(thread_id)
+        if user_id is not None:
+            await self.remember(user_id, thread_id)
+        return user_id
+
+    async def remember(self, user_id: int, thread_id: int):
+        """Запоминает пару после создания топика"""
+        self._put_local(user_id, thread_id)
+        await self._put_redis({user_id: thread_id})
+
+    async def invalidate(self, user_id: int, thread_id: int):
+        """Забывает топик thread_id пользователя, если кэш ещё указывает на него"""
+        if self._by_thread.get(thread_id) == user_id:
+            self._drop_local(user_id, thread_id)
+        try:
+            await self._invalidate(keys=[USER_TO_THREAD_KEY, THREAD_TO_USER_KEY], args=[user_id, thread_id])
+        except Exception as e:
+            logger.warning(f"[THREAD_CACHE] Не удалось удалить топик из Redis: {e}")
+
+    async def warm_up(self):
+        """Загружает последние топики из БД при старте бота"""
+        threads = await ThreadORM.get_recent_threads(limit=self.maxsize)
+        # Самые свежие должны оказаться в конце LRU
+        for user_id, thread_id in reversed(threads):
+            self._put_local(user_id, thread_id)
+        if threads:
+            await self._put_redis(dict(threads))
+        logger.info(f"[THREAD_CACHE] Загружено топиков: {len(threads)}")
+
+
+thread_cache = ThreadCache()
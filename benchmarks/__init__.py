@@ -0,0 +1,3 @@
+"""
+Бенчмарки бота. Запускаются вручную из корня репозитория, см. README.
+"""
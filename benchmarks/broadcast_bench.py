@@ -0,0 +1,183 @@
+"""
+Бенчмарк пропускной способности рассылки.
+
+Поднимает локальный fake Bot API (benchmarks/fake_bot_api.py), заполняет локальный
+Postgres синтетическими пользователями и прогоняет через него реальный путь рассылки
+app.sender.jobs.run_job: выборку получателей, пул воркеров, запись результатов.
+
+    uv run python -m benchmarks.broadcast_bench --recipients 1000 10000 100000
+
+Postgres берётся из .env (POSTGRES_*). Нужна отдельная локальная база с применёнными
+миграциями: бенчмарк рассылает всем пользователям базы и отказывается запускаться,
+если в ней есть несинтетические пользователи (см. --force).
+Каждый размер прогоняется в отдельном процессе, чтобы пиковый RSS не смешивался.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+# ID синтетических пользователей — не пересекаются с реальными Telegram ID
+SYNTHETIC_USER_BASE = 9_000_000_000_000
+# admin_id задач рассылки, созданных бенчмарком
+BENCH_ADMIN_ID = -1
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "db"}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк рассылки против локального fake Bot API")
+    parser.add_argument("--recipients", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Количества получателей для прогонов")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Средняя задержка ответа API")
+    parser.add_argument("--flood-every", type=int, default=0, help="Каждый N-й запрос отвечает 429 (0 — никогда)")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after для 429")
+    parser.add_argument("--blocked-ratio", type=float, default=0.05, help="Доля получателей, заблокировавших бота")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Лимит token bucket рассылки, сообщений/сек")
+    parser.add_argument("--workers", type=int, default=None, help="Размер пула воркеров (по умолчанию из .env)")
+    parser.add_argument("--limited-bot", action="store_true",
+                        help="Использовать LimitedBot, как в продакшене (добавляет его лимит 30 сообщений/сек)")
+    parser.add_argument("--force", action="store_true", help="Запускать даже при наличии реальных пользователей в базе")
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+async def run_child(size: int, args: argparse.Namespace) -> dict:
+    """Один прогон рассылки на size получателей"""
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from limited_aiogram import LimitedBot
+    from sqlalchemy import text
+
+    from app.sender import jobs
+    from app.sender.broadcast import TokenBucket
+    from benchmarks.fake_bot_api import FakeApiSettings, FakeBotApi
+    from config_data.config import load_config
+    from db.database import async_engine
+    from db.ORM import BroadcastORM
+
+    config = load_config()
+    if config.postgres.host not in LOCAL_HOSTS:
+        raise SystemExit(f"Бенчмарк запускается только на локальном Postgres, а не на {config.postgres.host}")
+
+    async with async_engine.begin() as conn:
+        real_users = (await conn.execute(
+            text("SELECT count(*) FROM users WHERE user_id < :base"), {"base": SYNTHETIC_USER_BASE}
+        )).scalar_one()
+        if real_users and not args.force:
+            raise SystemExit(f"В базе {real_users} несинтетических пользователей — используйте отдельную базу или --force")
+
+        await conn.execute(text("DELETE FROM broadcast_jobs WHERE admin_id = :admin_id"), {"admin_id": BENCH_ADMIN_ID})
+        await conn.execute(text("DELETE FROM users WHERE user_id >= :base"), {"base": SYNTHETIC_USER_BASE})
+        await conn.execute(text(
+            "INSERT INTO users (user_id, user_name, user_status, total_posts, created_at) "
+            "SELECT CAST(:base AS BIGINT) + g, 'bench_' || g, 'active', 0, now() FROM generate_series(1, :size) AS g"
+        ), {"base": SYNTHETIC_USER_BASE, "size": size})
+
+    server = FakeBotApi(FakeApiSettings(
+        latency_ms=args.latency_ms,
+        flood_every=args.flood_every,
+        retry_after=args.retry_after,
+        blocked_ratio=args.blocked_ratio,
+    ))
+    await server.start()
+
+    latencies: list[float] = []
+
+    async def timing_middleware(make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(server.base_url))
+    session.middleware(timing_middleware)
+    bot_cls = LimitedBot if args.limited_bot else Bot
+    bot = bot_cls(token="123456:BENCHMARK-TOKEN", session=session)
+    jobs.broadcast_bucket = TokenBucket(rate=args.rate)
+
+    try:
+        job = await BroadcastORM.create_job(
+            admin_id=BENCH_ADMIN_ID,
+            recipient_type="send_all",
+            recipient_ids=None,
+            payload={"from_chat_id": 1, "message_ids": [1]},
+            total=size,
+        )
+        started = time.perf_counter()
+        await jobs.run_job(bot, job)
+        wall_time = time.perf_counter() - started
+        job = await BroadcastORM.get_job(job.id)
+    finally:
+        await session.close()
+        await server.stop()
+        async with async_engine.begin() as conn:
+            await conn.execute(text("DELETE FROM broadcast_jobs WHERE admin_id = :admin_id"), {"admin_id": BENCH_ADMIN_ID})
+            await conn.execute(text("DELETE FROM users WHERE user_id >= :base"), {"base": SYNTHETIC_USER_BASE})
+        await async_engine.dispose()
+
+    processed = job.success_count + job.failed_count
+    return {
+        "recipients": size,
+        "sent": job.success_count,
+        "failed": job.failed_count,
+        "api_requests": sum(server.stats.requests.values()),
+        "flood_errors": server.stats.flood_errors,
+        "wall_time_s": round(wall_time, 2),
+        "messages_per_s": round(processed / wall_time, 1) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        # ru_maxrss на Linux — в килобайтах
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    args = parse_args()
+
+    if args.child is not None:
+        if args.workers:
+            os.environ["BROADCAST_WORKERS"] = str(args.workers)
+        result = asyncio.run(run_child(args.child, args))
+        print(json.dumps(result))
+        return
+
+    passthrough = list(sys.argv[1:])
+    # Убираем --recipients и его значения — каждому дочернему процессу передаётся свой размер
+    if "--recipients" in passthrough:
+        index = passthrough.index("--recipients")
+        end = index + 1
+        while end < len(passthrough) and not passthrough[end].startswith("--"):
+            end += 1
+        del passthrough[index:end]
+
+    columns = ["recipients", "sent", "failed", "api_requests", "flood_errors",
+               "wall_time_s", "messages_per_s", "p50_ms", "p99_ms", "peak_rss_mb"]
+    print(" | ".join(f"{column:>14}" for column in columns))
+    for size in args.recipients:
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.broadcast_bench", "--child", str(size), *passthrough],
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            print(process.stderr, file=sys.stderr)
+            sys.exit(process.returncode)
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        print(" | ".join(f"{result[column]:>14}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
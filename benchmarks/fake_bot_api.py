@@ -0,0 +1,103 @@
+"""
+Локальная замена Telegram Bot API для бенчмарков.
+
+Отвечает на методы, которые использует рассылка, с настраиваемой задержкой,
+периодическими 429 (retry_after) и 403 «bot was blocked by the user».
+"""
+import asyncio
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+
+@dataclass
+class FakeApiSettings:
+    latency_ms: float = 50.0  # Средняя задержка ответа
+    flood_every: int = 0  # Каждый N-й запрос отвечает 429 (0 — никогда)
+    retry_after: int = 1  # retry_after для 429
+    blocked_ratio: float = 0.0  # Доля получателей, заблокировавших бота
+
+
+@dataclass
+class FakeApiStats:
+    requests: Counter = field(default_factory=Counter)
+    flood_errors: int = 0
+    blocked_errors: int = 0
+
+
+class FakeBotApi:
+    """HTTP-сервер, имитирующий https://api.telegram.org/bot<token>/<method>"""
+
+    def __init__(self, settings: FakeApiSettings, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings
+        self.stats = FakeApiStats()
+        self.host = host
+        self.port = port
+        self._message_id = 0
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _is_blocked(self, chat_id: int) -> bool:
+        # Детерминированно: одни и те же пользователи «блокируют» бота в каждом прогоне
+        return (chat_id * 2654435761) % 10_000 < self.settings.blocked_ratio * 10_000
+
+    def _next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        self.stats.requests[method] += 1
+        params = dict(await request.post())
+
+        latency = self.settings.latency_ms / 1000
+        await asyncio.sleep(random.uniform(latency * 0.5, latency * 1.5))
+
+        total = sum(self.stats.requests.values())
+        if self.settings.flood_every and total % self.settings.flood_every == 0:
+            self.stats.flood_errors += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.settings.retry_after}",
+                "parameters": {"retry_after": self.settings.retry_after},
+            }, status=429)
+
+        chat_id = int(params.get("chat_id", 0) or 0)
+        if chat_id > 0 and self._is_blocked(chat_id):
+            self.stats.blocked_errors += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 403,
+                "description": "Forbidden: bot was blocked by the user",
+            }, status=403)
+
+        if method == "copymessages":
+            message_ids = params.get("message_ids", "[]").strip("[]").split(",")
+            result = [{"message_id": self._next_message_id()} for _ in message_ids]
+        elif method == "copymessage":
+            result = {"message_id": self._next_message_id()}
+        elif method == "getme":
+            result = {"id": 123456, "is_bot": True, "first_name": "Bench"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Порт 0 — берём фактически выделенный
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
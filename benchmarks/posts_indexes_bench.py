@@ -0,0 +1,122 @@
+"""
+Бенчмарк индексов user_posts.
+
+Заполняет локальный Postgres синтетическими постами и печатает EXPLAIN ANALYZE
+горячих запросов PostsORM без индексов и с индексами из миграции f2c8d4a6b9e3.
+
+    uv run python -m benchmarks.posts_indexes_bench --posts 1000000
+
+Postgres берётся из .env (POSTGRES_*), нужна локальная база с применёнными миграциями.
+Индексы на время замера "до" удаляются и затем создаются заново, синтетические посты
+в конце удаляются.
+"""
+import argparse
+import asyncio
+import re
+import time
+
+from benchmarks.broadcast_bench import LOCAL_HOSTS, SYNTHETIC_USER_BASE
+
+# Индексы из миграции f2c8d4a6b9e3
+INDEXES = {
+    "ix_user_posts_active_date_published":
+        "CREATE INDEX ix_user_posts_active_date_published ON user_posts (date_published) "
+        "WHERE is_published AND NOT is_deleted",
+    "ix_user_posts_user_id_created_at":
+        "CREATE INDEX ix_user_posts_user_id_created_at ON user_posts (user_id, created_at DESC)",
+}
+
+# Запросы PostsORM.get_active_posts и PostsORM.get_user_posts
+QUERIES = {
+    "get_active_posts (первые 100)":
+        "SELECT * FROM user_posts WHERE is_published AND NOT is_deleted "
+        "ORDER BY date_published DESC LIMIT 100",
+    "get_active_posts (все)":
+        "SELECT * FROM user_posts WHERE is_published AND NOT is_deleted "
+        "ORDER BY date_published DESC",
+    "get_user_posts":
+        "SELECT * FROM user_posts WHERE user_id = :user_id ORDER BY created_at DESC",
+}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE запросов к user_posts до и после индексов")
+    parser.add_argument("--posts", type=int, default=1_000_000, help="Сколько синтетических постов создать")
+    parser.add_argument("--users", type=int, default=50_000, help="Между сколькими пользователями их распределить")
+    parser.add_argument("--keep", action="store_true", help="Не удалять синтетические посты после замера")
+    return parser.parse_args(argv)
+
+
+async def explain(conn, sql: str, params: dict) -> tuple[str, float]:
+    """Возвращает план запроса и время выполнения по EXPLAIN ANALYZE, мс"""
+    from sqlalchemy import text
+
+    rows = (await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)).scalars().all()
+    plan = "\n".join(rows)
+    match = re.search(r"Execution Time: ([\d.]+) ms", plan)
+    return plan, float(match.group(1)) if match else 0.0
+
+
+async def run_queries(conn, params: dict) -> dict[str, float]:
+    timings = {}
+    for name, sql in QUERIES.items():
+        plan, elapsed = await explain(conn, sql, params)
+        timings[name] = elapsed
+        print(f"\n--- {name}: {elapsed:.2f} ms\n{plan}")
+    return timings
+
+
+async def main(args: argparse.Namespace):
+    from sqlalchemy import text
+
+    from config_data.config import load_config
+    from db.database import async_engine
+
+    config = load_config()
+    if config.postgres.host not in LOCAL_HOSTS:
+        raise SystemExit(f"Бенчмарк запускается только на локальном Postgres, а не на {config.postgres.host}")
+
+    params = {"user_id": SYNTHETIC_USER_BASE + 1}
+    # Индексы создаются вне транзакции, поэтому autocommit
+    engine = async_engine.execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("DELETE FROM user_posts WHERE user_id >= :base"), {"base": SYNTHETIC_USER_BASE})
+            started = time.perf_counter()
+            await conn.execute(text(
+                "INSERT INTO user_posts (user_id, post_id, post_text, is_published, is_deleted, "
+                "date_published, tariff_user, created_at) "
+                "SELECT CAST(:base AS BIGINT) + g % :users, g, 'bench post ' || g, g % 10 <> 0, g % 7 = 0, "
+                "now() - g * interval '1 minute', 'free', now() - g * interval '1 minute' "
+                "FROM generate_series(1, :posts) AS g"
+            ), {"base": SYNTHETIC_USER_BASE, "users": args.users, "posts": args.posts})
+            print(f"Создано {args.posts} постов за {time.perf_counter() - started:.1f} сек.")
+
+            for name in INDEXES:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            await conn.execute(text("VACUUM ANALYZE user_posts"))
+            print("\n========== Без индексов ==========")
+            before = await run_queries(conn, params)
+
+            for sql in INDEXES.values():
+                await conn.execute(text(sql))
+            await conn.execute(text("ANALYZE user_posts"))
+            print("\n========== С индексами ==========")
+            after = await run_queries(conn, params)
+
+            print(f"\n{'запрос':<32} | {'до, мс':>10} | {'после, мс':>10} | {'ускорение':>9}")
+            for name in QUERIES:
+                speedup = before[name] / after[name] if after[name] else 0.0
+                print(f"{name:<32} | {before[name]:>10.2f} | {after[name]:>10.2f} | {speedup:>8.1f}x")
+    finally:
+        async with engine.connect() as conn:
+            # Индексы должны остаться, как после миграции
+            for name, sql in INDEXES.items():
+                await conn.execute(text(sql.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1)))
+            if not args.keep:
+                await conn.execute(text("DELETE FROM user_posts WHERE user_id >= :base"), {"base": SYNTHETIC_USER_BASE})
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
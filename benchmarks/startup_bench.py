@@ -0,0 +1,104 @@
+"""
+Бенчмарк старта бота.
+
+Импортирует bot.py в отдельных процессах и печатает время импорта (медиана, min, max)
+и самые тяжёлые пакеты по данным `python -X importtime`. С --checks дополнительно
+замеряет проверки готовности (PostgreSQL, Redis) последовательно и параллельно.
+
+    uv run python -m benchmarks.startup_bench --runs 5
+    uv run python -m benchmarks.startup_bench --runs 5 --checks
+
+Переменные окружения берутся из .env, как при обычном запуске бота.
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# self [us] | cumulative | модуль
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \|\s+(\S+)")
+
+# Печатает время импорта модуля в секундах; importtime пишется в stderr
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Время импорта и проверок готовности бота")
+    parser.add_argument("--runs", type=int, default=5, help="Сколько раз импортировать модуль")
+    parser.add_argument("--module", default="bot", help="Какой модуль импортировать")
+    parser.add_argument("--top", type=int, default=15, help="Сколько самых тяжёлых пакетов показать")
+    parser.add_argument("--checks", action="store_true", help="Замерить проверки готовности PostgreSQL и Redis")
+    return parser.parse_args(argv)
+
+
+def measure_import(module: str) -> tuple[float, dict[str, float]]:
+    """
+    Импортирует модуль в новом процессе.
+    Возвращает время импорта, с, и собственное время импорта модулей, сложенное по корневым пакетам, с.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            packages[match.group(2).split(".")[0]] += int(match.group(1)) / 1_000_000
+    return float(result.stdout.strip().splitlines()[-1]), packages
+
+
+async def measure_checks() -> tuple[float, float]:
+    """Время проверок готовности из bot.py: последовательно и через gather, с"""
+    sys.path.insert(0, str(ROOT))
+    from bot import check_postgres, check_redis
+    from db.database import async_engine
+
+    # Первое соединение открывает пул — прогреваем, чтобы сравнивать одинаковые условия
+    await check_postgres()
+    await async_engine.dispose()
+
+    started = time.perf_counter()
+    await check_postgres()
+    await check_redis()
+    sequential = time.perf_counter() - started
+    await async_engine.dispose()
+
+    started = time.perf_counter()
+    await asyncio.gather(check_postgres(), check_redis())
+    parallel = time.perf_counter() - started
+    await async_engine.dispose()
+    return sequential, parallel
+
+
+def main(args: argparse.Namespace):
+    timings = []
+    packages = defaultdict(list)
+    for _ in range(args.runs):
+        elapsed, by_package = measure_import(args.module)
+        timings.append(elapsed)
+        for name, seconds in by_package.items():
+            packages[name].append(seconds)
+
+    print(f"import {args.module}: медиана {statistics.median(timings):.3f} с, "
+          f"min {min(timings):.3f} с, max {max(timings):.3f} с, запусков: {args.runs}")
+
+    print(f"\n{'пакет':<30} {'медиана, с':>12}")
+    heaviest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, seconds in heaviest[:args.top]:
+        print(f"{name:<30} {statistics.median(seconds):>12.3f}")
+
+    if args.checks:
+        sequential, parallel = asyncio.run(measure_checks())
+        print(f"\nпроверки готовности: последовательно {sequential:.3f} с, параллельно {parallel:.3f} с")
+
+
+if __name__ == "__main__":
+    main(parse_args())
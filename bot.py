@@ -1,26 +1,33 @@
 import asyncio
 import logging
+import time
 import limited_aiogram
 
 from aiogram import Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramBadRequest
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sqlalchemy import text
 
 from app.handlers.admin_handlers import router as admin_router
 from app.handlers.user_handlers import router as user_router
 from app.keybords.main_menu import set_main_menu
+from app.middlewares.db_session_middleware import DbSessionMiddleware, ReleaseSessionMiddleware
 from app.middlewares.logger_middleware import LoggingMiddleware
+from app.service.log_writer import log_writer
+from app.service.fsm_storage import clean_fsm_storage, create_storage
+from app.service.metrics import log_metrics, start_metrics_server
+from app.service.post_checker import check_deleted_posts, close_checker_bot
+from app.service.spare_topics import refill_spare_topics, schedule_refill
 from app.middlewares.album_middleware import AlbumMiddleware
 
-from aiogram.fsm.storage.redis import RedisStorage
 from app.sender import sender
-from app.service.redis_client import redis
+from app.sender.jobs import resume_jobs
+from app.service.redis_client import FSM, CACHE, THROTTLE, LOCKS, LOCK_WAITS, close_redis, get_redis, redis
+from app.service.thread_cache import thread_cache
 from config_data.config import ConfigEnv, load_config
 from db.database import async_engine
-from db.ORM import PostsORM
+from db.ORM import LoggerORM, PostsORM
 
 # Инициализируем логгер
 logger = logging.getLogger(__name__)
@@ -29,7 +36,13 @@ logger = logging.getLogger(__name__)
 config: ConfigEnv = load_config()
 bot = limited_aiogram.LimitedBot(token=config.tg_bot.token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 
-storage = RedisStorage(redis=redis)
+# Данные FSM (черновики объявлений и рассылок) — в компактном формате и с TTL
+storage = create_storage(
+    get_redis(FSM),
+    serializer=config.fsm.serializer,
+    state_ttl=config.fsm.state_ttl,
+    data_ttl=config.fsm.data_ttl,
+)
 scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
 
 
@@ -44,65 +57,47 @@ async def heartbeat():
         await asyncio.sleep(10)
 
 
-async def check_deleted_posts():
+async def check_postgres():
+    """Проверяет соединение с PostgreSQL — без базы бот не запускается"""
+    async with async_engine.connect() as conn:
+        res = await conn.execute(text('SELECT VERSION()'))
+        logger.info(f'Starting {res.first()[0]}')
+
+
+async def check_redis():
+    """Проверяет соединение с Redis. Кэши без него работают через БД, поэтому старт не прерываем"""
+    try:
+        # Заодно открываем по соединению в пуле каждого потребителя
+        await asyncio.gather(*(get_redis(name).ping() for name in (FSM, CACHE, THROTTLE, LOCKS, LOCK_WAITS)))
+    except Exception as e:
+        logger.error(f"[REDIS] Redis недоступен при старте: {e}")
+
+
+async def maintain_log_partitions():
+    """
+    Обслуживает месячные партиции таблицы logger:
+    создаёт партиции на ближайшие месяцы и удаляет устаревшие.
+    """
+    try:
+        await LoggerORM.ensure_partitions()
+        dropped = await LoggerORM.drop_expired_partitions(config.logs.retention_months)
+        if dropped:
+            logger.info(f"[LOG_PARTITIONS] Удалены партиции логов: {', '.join(dropped)}")
+    except Exception as e:
+        logger.error(f"[LOG_PARTITIONS] Ошибка обслуживания партиций логов: {e}")
+
+
+async def rebuild_post_counters():
     """
-    Проверяет существуют ли посты в канале.
-    Если пост удалён — помечает его в БД.
+    Сверяет счётчики постов пользователей с user_posts.
+    Исправляет расхождения после ручных правок в базе и удалений постов из админки.
     """
-    logger.info("[CHECK_POSTS] Начинаю проверку постов на удаление...")
-    
     try:
-        posts = await PostsORM.get_active_posts()
-        logger.info(f"[CHECK_POSTS] Найдено {len(posts)} активных постов для проверки")
-        
-        deleted_ids = []
-        checked = 0
-        
-        for post in posts:
-            try:
-                # Пытаемся "отредактировать" reply_markup
-                # Если сообщение существует - получим "message is not modified"
-                # Если не существует - получим "message not found"
-                await bot.edit_message_reply_markup(
-                    chat_id=config.tg_bot.channel_id,
-                    message_id=post.post_id,
-                    reply_markup=None
-                )
-                checked += 1
-                
-            except TelegramBadRequest as e:
-                error_msg = str(e).lower()
-                
-                if "message to edit not found" in error_msg or \
-                "message not found" in error_msg:
-                    # Пост удалён из канала
-                    deleted_ids.append(post.id)
-                    logger.info(f"[CHECK_POSTS] Пост ID={post.id} (TG: {post.post_id}) удалён из канала")
-                    
-                elif "message is not modified" in error_msg or \
-                    "message can't be edited" in error_msg or \
-                    "there is no reply markup" in error_msg:
-                    # Сообщение существует, просто не изменилось или нет markup
-                    checked += 1
-                    
-                else:
-                    logger.warning(f"[CHECK_POSTS] Ошибка проверки поста {post.id}: {e}")
-                    
-            except Exception as e:
-                logger.warning(f"[CHECK_POSTS] Неизвестная ошибка для поста {post.id}: {e}")
-            
-            # Небольшая задержка
-            await asyncio.sleep(0.5)
-        
-        # Помечаем удалённые посты
-        if deleted_ids:
-            count = await PostsORM.mark_posts_as_deleted(deleted_ids)
-            logger.info(f"[CHECK_POSTS] Помечено как удалённые: {count} постов")
-        
-        logger.info(f"[CHECK_POSTS] Проверка завершена. Проверено: {checked}, удалено: {len(deleted_ids)}")
-        
+        fixed = await PostsORM.rebuild_post_counters()
+        if fixed:
+            logger.warning(f"[POST_COUNTERS] Исправлены счётчики постов у {fixed} пользователей")
     except Exception as e:
-        logger.error(f"[CHECK_POSTS] Ошибка при проверке постов: {e}")
+        logger.error(f"[POST_COUNTERS] Ошибка пересчёта счётчиков постов: {e}")
 
 
 async def main():
@@ -115,14 +110,37 @@ async def main():
     # Выводим в консоль информацию о начале запуска бота
     logger.info('Starting bot')
 
-    # Проверяем соединение с PostgreSQL
-    async with async_engine.connect() as conn:
-        res = await conn.execute(text('SELECT VERSION()'))
-        logger.info(f'Starting {res.first()[0]}')
+    # Проверки готовности и подготовка к работе независимы — выполняем параллельно:
+    # соединения с PostgreSQL и Redis, главное меню бота, кэш топиков и партиции логов
+    started = time.perf_counter()
+    await asyncio.gather(
+        check_postgres(),
+        check_redis(),
+        set_main_menu(bot),
+        thread_cache.warm_up(),
+        maintain_log_partitions(),
+    )
+    logger.info(f"Проверки готовности заняли {time.perf_counter() - started:.2f} с")
 
     dp = Dispatcher(bot=bot, storage=storage)
 
+    # Метрики: HTTP-эндпоинт /metrics и периодическая сводка в логе
+    if config.metrics.port:
+        metrics_runner = await start_metrics_server(config.metrics.port)
+        dp.shutdown.register(metrics_runner.cleanup)
+    if config.metrics.log_interval:
+        asyncio.create_task(log_metrics(config.metrics.log_interval))
+
+    # Логи действий пишутся в БД пачками в фоне
+    log_writer.start()
+    dp.shutdown.register(log_writer.stop)
+    dp.shutdown.register(close_redis)
+    dp.shutdown.register(close_checker_bot)
+
     # Регистрируем middleware
+    # Одна сессия БД на апдейт — для всех обращений к БД в его обработчиках
+    dp.update.middleware(DbSessionMiddleware())
+    bot.session.middleware(ReleaseSessionMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
     dp.message.middleware(LoggingMiddleware())
     dp.message.middleware(AlbumMiddleware(latency=0.5, admin_ids=config.tg_bot.admin_ids))
@@ -133,22 +151,66 @@ async def main():
 
     dp.include_router(sender.router)
 
-    # Настраиваем главное меню бота
-    await set_main_menu(bot)
-
     # Запускаем heartbeat в фоне
     asyncio.create_task(heartbeat())
 
+    # Продолжаем рассылки, прерванные рестартом
+    await resume_jobs(bot)
+
+    # Пул свободных топиков: наполняем в фоне сразу и досоздаём раз в минуту
+    if config.spare_topics.size > 0:
+        schedule_refill(bot)
+        scheduler.add_job(
+            refill_spare_topics,
+            'interval',
+            minutes=1,
+            args=[bot],
+            id='refill_spare_topics',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
     # Запускаем scheduler для периодической проверки постов
     scheduler.add_job(
         check_deleted_posts,
         'interval',
-        hours=1,  # Проверяем каждые 1 час
+        minutes=10,  # Каждый запуск проверяет только посты, которым пора проверка
         id='check_deleted_posts',
+        replace_existing=True,
+        # Проход, не уложившийся в интервал, не запускается повторно поверх себя
+        max_instances=1,
+        coalesce=True
+    )
+    # Партиции логов: при старте (см. проверки готовности) и затем раз в сутки
+    scheduler.add_job(
+        maintain_log_partitions,
+        'cron',
+        hour=4,
+        id='maintain_log_partitions',
+        replace_existing=True
+    )
+    scheduler.add_job(
+        rebuild_post_counters,
+        'cron',
+        hour=4,
+        minute=30,
+        id='rebuild_post_counters',
         replace_existing=True
     )
+    # Уборка FSM: TTL ключам, записанным без него, и удаление брошенных черновиков
+    scheduler.add_job(
+        clean_fsm_storage,
+        'interval',
+        hours=1,
+        args=[storage],
+        id='clean_fsm_storage',
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
     scheduler.start()
-    logger.info("Scheduler запущен. Проверка постов каждые 1 час.")
+    logger.info("Scheduler запущен. Проверка постов каждые 10 минут.")
 
     # Пропускаем накопившиеся апдейты и запускаем polling
     await bot.delete_webhook(drop_pending_updates=True)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from environs import Env
 
 
@@ -19,6 +20,8 @@ class Postgres:
     user: str
     password: str
     database: str
+    replica_url: str | None  # URL реплики только для чтения (None — все запросы на primary)
+    read_your_writes: float  # сколько секунд после записи читать данные пользователя с primary
 
 @dataclass
 class S3:
@@ -27,25 +30,91 @@ class S3:
     url: str
     name: str
 
+@dataclass
+class DbPool:
+    size: int  # постоянных соединений в пуле
+    max_overflow: int  # сколько соединений можно открыть сверх size при нагрузке
+    timeout: float  # сколько ждать свободное соединение, сек.
+    recycle: int  # пересоздавать соединения старше, сек.
+    pgbouncer: bool  # подключение через PgBouncer (transaction pooling): без кэша prepared statements
+
 @dataclass
 class Redis:
     host: str
     port: int
     password: str
+    max_connections: int  # соединений в пуле каждого клиента (FSM, кэш, лимиты, блокировки)
+    pool_timeout: float  # сколько ждать свободное соединение из пула, сек.
+    socket_timeout: float  # таймаут ответа на команду, сек.
+    connect_timeout: float  # таймаут подключения, сек.
+    health_check_interval: int  # проверять PING соединение, простоявшее дольше, сек.
+    retries: int  # повторов команды при обрыве соединения или таймауте
+
+@dataclass
+class FsmStorage:
+    serializer: str  # формат данных FSM в Redis: msgpack, json или orjson (orjson — если установлен)
+    state_ttl: int  # сколько секунд хранить состояние FSM после последнего изменения (0 — бессрочно)
+    data_ttl: int  # сколько секунд хранить данные FSM (черновики) после последнего изменения (0 — бессрочно)
 
 @dataclass
 class OPENAI:
     api_key: str
 
+@dataclass
+class Broadcast:
+    rate: float  # сообщений в секунду на всю рассылку (лимит Telegram ~30)
+    workers: int  # количество параллельных отправителей
+
+@dataclass
+class RateLimits:
+    command: int  # команд (/start, /info, /select_language) за command_window секунд
+    command_window: float
+    callback: int  # нажатий inline-кнопок за callback_window секунд
+    callback_window: float
+    message: int  # запас сообщений в топик, восполняется за message_window секунд
+    message_window: float
+    message_max_wait: float  # сколько секунд сообщение сверх лимита ждёт очереди, прежде чем отказать
+
+@dataclass
+class PostCheck:
+    rate: float  # проб в секунду при проверке удалённых постов
+    workers: int  # количество параллельных проб
+    min_interval: int  # интервал проверки свежего поста, минут
+    max_interval: int  # предельный интервал проверки старого поста, минут
+    batch_size: int  # сколько просроченных постов проверять за один запуск
+
+@dataclass
+class SpareTopics:
+    size: int  # сколько свободных топиков держать наготове в группе модерации (0 — не держать)
+
+@dataclass
+class Logs:
+    retention_months: int  # сколько месяцев хранить логи действий пользователей
+
+@dataclass
+class Metrics:
+    port: int  # порт HTTP-эндпоинта /metrics (0 — не запускать)
+    log_interval: int  # как часто писать сводку метрик в лог, сек. (0 — не писать)
+
 @dataclass
 class ConfigEnv:
     tg_bot: TgBot
     postgres: Postgres
+    db_pool: DbPool
     redis: Redis
+    fsm: FsmStorage
     s3: S3
     openai: OPENAI
+    broadcast: Broadcast
+    logs: Logs
+    spare_topics: SpareTopics
+    rate_limits: RateLimits
+    post_check: PostCheck
+    metrics: Metrics
 
+@lru_cache(maxsize=None)
 def load_config(path: str | None = None) -> ConfigEnv:
+    """Читает .env один раз: повторные вызовы из модулей получают тот же объект"""
     env = Env()
     env.read_env(path)
     return ConfigEnv(
@@ -63,11 +132,31 @@ def load_config(path: str | None = None) -> ConfigEnv:
             user=env('POSTGRES_USER'),
             password=env('POSTGRES_PASSWORD'),
             database=env('POSTGRES_DB'),
+            replica_url=env('POSTGRES_REPLICA_URL', None) or None,
+            read_your_writes=env.float('POSTGRES_READ_YOUR_WRITES', 5.0),
+        ),
+        db_pool=DbPool(
+            size=env.int('DB_POOL_SIZE', 10),
+            max_overflow=env.int('DB_MAX_OVERFLOW', 10),
+            timeout=env.float('DB_POOL_TIMEOUT', 30.0),
+            recycle=env.int('DB_POOL_RECYCLE', 1800),
+            pgbouncer=env.bool('DB_PGBOUNCER', False),
         ),
         redis=Redis(
             host=env('REDIS_HOST'),
             port=env('REDIS_PORT'),
             password=env('REDIS_PASSWORD'),
+            max_connections=env.int('REDIS_MAX_CONNECTIONS', 20),
+            pool_timeout=env.float('REDIS_POOL_TIMEOUT', 5.0),
+            socket_timeout=env.float('REDIS_SOCKET_TIMEOUT', 5.0),
+            connect_timeout=env.float('REDIS_CONNECT_TIMEOUT', 2.0),
+            health_check_interval=env.int('REDIS_HEALTH_CHECK_INTERVAL', 30),
+            retries=env.int('REDIS_RETRIES', 3),
+        ),
+        fsm=FsmStorage(
+            serializer=env('FSM_SERIALIZER', 'msgpack'),
+            state_ttl=env.int('FSM_STATE_TTL', 86400),
+            data_ttl=env.int('FSM_DATA_TTL', 86400),
         ),
         s3=S3(
             key_id=env('S3_ACCESS'),
@@ -78,6 +167,36 @@ def load_config(path: str | None = None) -> ConfigEnv:
         openai=OPENAI(
             api_key=env('OPENAI_API_KEY')
         ),
+        broadcast=Broadcast(
+            rate=env.float('BROADCAST_RATE', 25.0),
+            workers=env.int('BROADCAST_WORKERS', 20),
+        ),
+        logs=Logs(
+            retention_months=env.int('LOG_RETENTION_MONTHS', 6),
+        ),
+        spare_topics=SpareTopics(
+            size=env.int('SPARE_TOPICS_SIZE', 5),
+        ),
+        rate_limits=RateLimits(
+            command=env.int('RATE_LIMIT_COMMAND', 3),
+            command_window=env.float('RATE_LIMIT_COMMAND_WINDOW', 2.0),
+            callback=env.int('RATE_LIMIT_CALLBACK', 3),
+            callback_window=env.float('RATE_LIMIT_CALLBACK_WINDOW', 2.0),
+            message=env.int('RATE_LIMIT_MESSAGE', 30),
+            message_window=env.float('RATE_LIMIT_MESSAGE_WINDOW', 60.0),
+            message_max_wait=env.float('RATE_LIMIT_MESSAGE_MAX_WAIT', 30.0),
+        ),
+        post_check=PostCheck(
+            rate=env.float('POST_CHECK_RATE', 0.3),
+            workers=env.int('POST_CHECK_WORKERS', 2),
+            min_interval=env.int('POST_CHECK_MIN_INTERVAL', 60),
+            max_interval=env.int('POST_CHECK_MAX_INTERVAL', 7 * 24 * 60),
+            batch_size=env.int('POST_CHECK_BATCH_SIZE', 5000),
+        ),
+        metrics=Metrics(
+            port=env.int('METRICS_PORT', 0),
+            log_interval=env.int('METRICS_LOG_INTERVAL', 60),
+        ),
     )
 config: ConfigEnv = load_config()
 
@@ -2,14 +2,16 @@ import logging
 import random
 from datetime import datetime, timedelta, timezone
 import re
-from typing import Optional
+from typing import AsyncIterator, Optional
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from db.database import *
 from db.models import *
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, func, insert
+from sqlalchemy import update, delete, func, insert, or_, exists, all_, any_, bindparam, text, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from config_data.config import ConfigEnv, load_config
 
@@ -18,6 +20,15 @@ config: ConfigEnv = load_config()
 # Инициализируем логгер
 logger = logging.getLogger(__name__)
 
+# Имена месячных партиций таблицы logger: logger_y2026m01
+LOGGER_PARTITION_RE = re.compile(r"^logger_y(\d{4})m(\d{2})$")
+
+
+def month_start(value: datetime, shift: int = 0) -> datetime:
+    """Начало месяца (UTC) со сдвигом на shift месяцев"""
+    index = value.year * 12 + value.month - 1 + shift
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
 
 class LoggerORM:
 
@@ -31,43 +42,144 @@ class LoggerORM:
             session.add(new_log)
             await session.commit()
 
+    @staticmethod
+    async def create_logs(rows: list[dict]) -> bool:
+        """
+        Создание пачки логов одним multi-row INSERT
+        :param rows: Список {"timestamp", "user_id", "user_name", "action", "type"}
+        """
+        if not rows:
+            return True
+        async with session_factory_async() as session:
+            try:
+                await session.execute(insert(Logger).values(rows))
+                await session.commit()
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при записи пачки логов: {e}")
+                return False
 
-class DataBase:
     @staticmethod
-    async def insert_user(user_id: int, user_name: str):
-        """Добавляет нового пользователя в БД или обновляет данные существующего"""
+    async def get_partitions() -> list[str]:
+        """Возвращает имена партиций таблицы logger"""
         async with session_factory_async() as session:
-            # Проверка, существует ли пользователь
-            query = select(Users).filter(Users.user_id == user_id)
-            result = await session.execute(query)
-            user = result.scalar_one_or_none()
+            result = await session.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'logger'::regclass"
+            ))
+            return list(result.scalars().all())
+
+    @staticmethod
+    async def ensure_partitions(months_ahead: int = 2) -> list[str]:
+        """
+        Создаёт партиции logger на текущий и months_ahead следующих месяцев
+        :return: Имена созданных партиций
+        """
+        existing = set(await LoggerORM.get_partitions())
+        now = datetime.now(timezone.utc)
+        created = []
+        for shift in range(months_ahead + 1):
+            start, upper = month_start(now, shift), month_start(now, shift + 1)
+            name = f"logger_y{start:%Y}m{start:%m}"
+            if name in existing:
+                continue
+
+            async with session_factory_async() as session:
+                try:
+                    bounds = {"start": start, "upper": upper}
+                    # Логи за этот месяц могли попасть в default-партицию — переносим их в новую
+                    in_default = (await session.execute(text(
+                        "SELECT EXISTS (SELECT 1 FROM logger_default "
+                        "WHERE timestamp >= :start AND timestamp < :upper)"
+                    ), bounds)).scalar()
+                    if in_default:
+                        await session.execute(text("ALTER TABLE logger DETACH PARTITION logger_default"))
+
+                    await session.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF logger "
+                        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+                    ))
+
+                    if in_default:
+                        await session.execute(text(
+                            "WITH moved AS (DELETE FROM logger_default "
+                            "WHERE timestamp >= :start AND timestamp < :upper RETURNING *) "
+                            "INSERT INTO logger SELECT * FROM moved"
+                        ), bounds)
+                        await session.execute(text("ALTER TABLE logger ATTACH PARTITION logger_default DEFAULT"))
+
+                    await session.commit()
+                    created.append(name)
+                    logger.info(f"[DB] Создана партиция логов {name}")
+                except Exception as e:
+                    await rollback(session)
+                    logger.error(f"[DB] Ошибка при создании партиции логов {name}: {e}")
+        return created
+
+    @staticmethod
+    async def drop_expired_partitions(retention_months: int) -> list[str]:
+        """
+        Удаляет партиции logger, целиком старше retention_months месяцев.
+        DROP партиции вместо DELETE — без долгих блокировок и раздувания таблицы.
+        :return: Имена удалённых партиций
+        """
+        cutoff = month_start(datetime.now(timezone.utc), -retention_months)
+        dropped = []
+        for name in await LoggerORM.get_partitions():
+            match = LOGGER_PARTITION_RE.match(name)
+            if not match:
+                continue
+            start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+            if month_start(start, 1) > cutoff:
+                continue
+
+            async with session_factory_async() as session:
+                try:
+                    await session.execute(text(f"DROP TABLE {name}"))
+                    await session.commit()
+                    dropped.append(name)
+                    logger.info(f"[DB] Удалена устаревшая партиция логов {name}")
+                except Exception as e:
+                    await rollback(session)
+                    logger.error(f"[DB] Ошибка при удалении партиции логов {name}: {e}")
+        return dropped
 
-            if user:
-                return user
-            else:
-                # Если пользователь не найден, создаем нового
-                user = Users(
-                    user_id=user_id,
-                    user_name=user_name,
-                )
-                session.add(user)
 
-            # Сохраняем изменения
+class DataBase:
+    @staticmethod
+    async def insert_user(user_id: int, user_name: str, session: Optional[AsyncSession] = None) -> bool:
+        """
+        Добавляет нового пользователя в БД или обновляет username существующего.
+        Один INSERT ... ON CONFLICT — без предварительного SELECT и гонок при одновременных /start.
+        """
+        stmt = pg_insert(Users).values(user_id=user_id, user_name=user_name)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Users.user_id],
+            set_={"user_name": stmt.excluded.user_name, "updated_at": func.now()},
+            where=Users.user_name.is_distinct_from(stmt.excluded.user_name)
+        ).returning(Users.user_id, literal_column("xmax = 0").label("inserted"))
+
+        async with session_scope(session) as session:
             try:
-                await session.commit()
-                logger.info(f"Пользователь {user_id} успешно добавлен в базу данных")
-                return user
-            except IntegrityError as e:
-                logger.error(f"Error inserting user: {e}")
-                await session.rollback()
+                row = (await session.execute(stmt)).first()
+                await commit(session, immediate=True)
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при добавлении пользователя {user_id}: {e}")
                 return False
-            return True
+
+        if row and row.inserted:
+            logger.info(f"Пользователь {user_id} успешно добавлен в базу данных")
+        elif row:
+            logger.info(f"Обновлён username пользователя {user_id}: {user_name}")
+        return True
 
 
     @staticmethod
-    async def get_all_users():
+    async def get_all_users(session: Optional[AsyncSession] = None):
         """Возвращает все записи из таблицы users."""
-        async with session_factory_async() as session:
+        async with read_session_scope(session) as session:
             try:
                 query = select(Users)
                 result = await session.execute(query)
@@ -79,12 +191,12 @@ class DataBase:
 
 
     @staticmethod
-    async def get_all_user_ids():
+    async def get_all_user_ids(session: Optional[AsyncSession] = None):
         """
         Получает список всех ID пользователей из базы данных.
         :return: Список ID пользователей.
         """
-        async with session_factory_async() as session:
+        async with read_session_scope(session) as session:
             try:
                 # Выполняем запрос к базе данных
                 query = select(Users.user_id)
@@ -100,21 +212,160 @@ class DataBase:
                 return []
 
     @staticmethod
-    async def get_user(user_id: int):
+    async def set_user_status(user_id: int, status: UserStatus, session: Optional[AsyncSession] = None) -> bool:
+        """Обновляет статус пользователя"""
+        async with session_scope(session) as session:
+            try:
+                query = (
+                    update(Users)
+                    .where(Users.user_id == user_id, Users.user_status.is_distinct_from(status))
+                    .values(user_status=status)
+                )
+                result = await session.execute(query)
+                await commit(session)
+                if result.rowcount:
+                    logger.info(f"[DB] Статус пользователя {user_id} изменён на {status.value}")
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при обновлении статуса пользователя {user_id}: {e}")
+                return False
+
+    @staticmethod
+    async def apply_delivery_outcomes(
+        delivered_ids: list[int],
+        statuses: dict[int, UserStatus],
+        session: Optional[AsyncSession] = None
+    ) -> bool:
+        """
+        Записывает итоги пачки отправок в одной транзакции
+
+        Args:
+            delivered_ids: Кому сообщение доставлено — обновляется last_delivery_at
+            statuses: Недоступные пользователи и их новый статус (blocked/deleted)
+        """
+        if not delivered_ids and not statuses:
+            return True
+        async with session_scope(session) as session:
+            try:
+                if delivered_ids:
+                    query = (
+                        update(Users)
+                        .where(Users.user_id.in_(delivered_ids))
+                        .values(last_delivery_at=datetime.now(timezone.utc))
+                    )
+                    await session.execute(query)
+
+                for status in set(statuses.values()):
+                    user_ids = [user_id for user_id, user_status in statuses.items() if user_status == status]
+                    query = (
+                        update(Users)
+                        .where(Users.user_id.in_(user_ids))
+                        .values(user_status=status)
+                    )
+                    await session.execute(query)
+
+                await commit(session)
+                if statuses:
+                    logger.info(f"[DB] Помечено недоступными пользователей: {len(statuses)}")
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при записи итогов доставки: {e}")
+                return False
+
+    @staticmethod
+    def _recipients_filter(exclude_ids: list[int] = None, job_id: int = None, only_ids: list[int] = None) -> list:
+        """Условия выборки получателей рассылки"""
+        conditions = [
+            # Заблокировавших бота и удалённых пользователей пропускаем
+            or_(Users.user_status.is_(None), Users.user_status.notin_([UserStatus.blocked, UserStatus.deleted]))
+        ]
+        if only_ids is not None:
+            # Рассылка выбранным: только те из них, кто есть среди активных пользователей
+            conditions.append(Users.user_id == any_(bindparam('only_ids', only_ids, type_=ARRAY(BigInteger))))
+        if exclude_ids:
+            conditions.append(Users.user_id != all_(bindparam('exclude_ids', exclude_ids, type_=ARRAY(BigInteger))))
+        if job_id:
+            # Анти-join: тем, кому рассылка уже доставлялась, повторно не отправляем
+            conditions.append(~exists().where(
+                BroadcastDelivery.job_id == job_id,
+                BroadcastDelivery.user_id == Users.user_id
+            ))
+        return conditions
+
+    @staticmethod
+    async def count_recipients(
+        exclude_ids: list[int] = None,
+        only_ids: list[int] = None,
+        session: Optional[AsyncSession] = None
+    ) -> int:
+        """Считает получателей рассылки"""
+        async with read_session_scope(session) as session:
+            conditions = DataBase._recipients_filter(exclude_ids, only_ids=only_ids)
+            query = select(func.count()).select_from(Users).filter(*conditions)
+            result = await session.execute(query)
+            return result.scalar_one()
+
+    @staticmethod
+    async def iter_recipient_ids(
+        after_user_id: int = 0,
+        exclude_ids: list[int] = None,
+        job_id: int = None,
+        only_ids: list[int] = None,
+        page_size: int = 1000
+    ) -> AsyncIterator[int]:
+        """
+        Отдаёт ID получателей рассылки по возрастанию страницами.
+        Каждая страница — отдельный короткий запрос по user_id > последнего,
+        поэтому память не растёт с числом пользователей и соединение не держится всю рассылку.
+        С job_id страницы читаются с primary: анти-join по доставкам должен видеть
+        только что записанный прогресс, иначе отстающая реплика вернёт уже получивших.
+
+        Args:
+            after_user_id: Начать с user_id больше указанного (курсор рассылки)
+            exclude_ids: Исключённые ID
+            job_id: ID рассылки — уже получившие её пропускаются
+            only_ids: Только эти ID (рассылка выбранным пользователям)
+            page_size: Размер страницы
+        """
+        conditions = DataBase._recipients_filter(exclude_ids, job_id, only_ids)
+        new_session = session_factory_async if job_id else read_session
+        last_user_id = after_user_id
+        while True:
+            async with new_session() as session:
+                query = (
+                    select(Users.user_id)
+                    .filter(Users.user_id > last_user_id, *conditions)
+                    .order_by(Users.user_id)
+                    .limit(page_size)
+                )
+                result = await session.execute(query)
+                page = result.scalars().all()
+
+            for user_id in page:
+                yield user_id
+
+            if len(page) < page_size:
+                return
+            last_user_id = page[-1]
+
+    @staticmethod
+    async def get_user(user_id: int, session: Optional[AsyncSession] = None):
         """Получает пользователя по ID"""
-        async with session_factory_async() as session:
+        async with read_session_scope(session) as session:
             query = select(Users).filter(Users.user_id == user_id)
             result = await session.execute(query)
             return result.scalar_one_or_none()
 
     @staticmethod
-    async def delete_user(user_id: int) -> bool:
+    async def delete_user(user_id: int, session: Optional[AsyncSession] = None) -> bool:
         """
         Удаляет пользователя из базы данных по user_id.
         Также удаляет все записи конструктора этого пользователя.
         Возвращает True, если пользователь был удалён, иначе False.
         """
-        async with session_factory_async() as session:
+        async with session_scope(session) as session:
             try:
                 query = select(Users).filter(Users.user_id == user_id)
                 result = await session.execute(query)
@@ -124,18 +375,22 @@ class DataBase:
                     return False
 
                 await session.delete(user)
-                await session.commit()
-                return True
-
+                # Сразу фиксируем: иначе /start между очисткой кэша и commit снова пометит пользователя известным
+                await commit(session, immediate=True)
             except Exception as e:
-                await session.rollback()
+                await rollback(session)
                 logger.error(f"[DB] Ошибка при удалении пользователя {user_id}: {e}")
                 return False
 
+        # Импорт здесь: known_users сам использует DataBase
+        from app.service.known_users import known_users
+        await known_users.forget(user_id)
+        return True
+
     @staticmethod
-    async def update_user_language(user_id: int, language: str):
+    async def update_user_language(user_id: int, language: str, session: Optional[AsyncSession] = None):
         """Обновляет язык пользователя"""
-        async with session_factory_async() as session:
+        async with session_scope(session) as session:
             try:
                 query = (
                     update(Users)
@@ -143,10 +398,10 @@ class DataBase:
                     .values(language=UserLanguage(language))
                 )
                 await session.execute(query)
-                await session.commit()
+                await commit(session)
                 return True
             except Exception as e:
-                await session.rollback()
+                await rollback(session)
                 logger.error(f"[DB] Ошибка при обновлении языка пользователя {user_id}: {e}")
                 return False
 
@@ -155,7 +410,12 @@ class ThreadORM:
     """Класс для работы с топиками пользователей"""
     
     @staticmethod
-    async def get_or_create_thread(user_id: int, user_name: str, thread_id: int = None):
+    async def get_or_create_thread(
+        user_id: int,
+        user_name: str,
+        thread_id: int = None,
+        session: Optional[AsyncSession] = None
+    ):
         """
         Получает или создает топик для пользователя
         :param user_id: ID пользователя
@@ -163,7 +423,7 @@ class ThreadORM:
         :param thread_id: ID топика (если создается)
         :return: UserThread объект
         """
-        async with session_factory_async() as session:
+        async with session_scope(session) as session:
             try:
                 # Проверяем, есть ли уже топик для пользователя
                 query = select(UserThread).filter(UserThread.user_id == user_id)
@@ -181,7 +441,7 @@ class ThreadORM:
                         thread_id=thread_id
                     )
                     session.add(new_thread)
-                    await session.commit()
+                    await commit(session, immediate=True)
                     await session.refresh(new_thread)
                     logger.info(f"Создан новый топик для пользователя {user_id}: thread_id={thread_id}")
                     return new_thread
@@ -189,24 +449,24 @@ class ThreadORM:
                 return None
             except IntegrityError:
                 # Дубликат - топик уже создан другим запросом, получаем его
-                await session.rollback()
+                await rollback(session)
                 logger.info(f"[ThreadORM] Топик для {user_id} уже существует (IntegrityError), получаем...")
                 query = select(UserThread).filter(UserThread.user_id == user_id)
                 result = await session.execute(query)
                 return result.scalar_one_or_none()
             except Exception as e:
-                await session.rollback()
+                await rollback(session)
                 logger.error(f"[DB] Ошибка при работе с топиком для пользователя {user_id}: {e}")
                 return None
     
     @staticmethod
-    async def get_thread_by_id(thread_id: int):
+    async def get_thread_by_id(thread_id: int, session: Optional[AsyncSession] = None):
         """
         Получает информацию о топике по его ID
         :param thread_id: ID топика
         :return: UserThread объект или None
         """
-        async with session_factory_async() as session:
+        async with read_session_scope(session) as session:
             try:
                 query = select(UserThread).filter(UserThread.thread_id == thread_id)
                 result = await session.execute(query)
@@ -216,19 +476,180 @@ class ThreadORM:
                 return None
     
     @staticmethod
-    async def get_user_by_thread_id(thread_id: int):
+    async def get_user_by_thread_id(thread_id: int, session: Optional[AsyncSession] = None):
         """
         Получает user_id по thread_id
         :param thread_id: ID топика
         :return: user_id или None
         """
-        logger.info(f"[ThreadORM] Ищем user_id для thread_id={thread_id}")
-        thread = await ThreadORM.get_thread_by_id(thread_id)
-        if thread:
-            logger.info(f"[ThreadORM] Найден thread: user_id={thread.user_id}")
-        else:
+        async with read_session_scope(session) as session:
+            try:
+                query = select(UserThread.user_id).filter(UserThread.thread_id == thread_id).limit(1)
+                user_id = (await session.execute(query)).scalar_one_or_none()
+            except Exception as e:
+                logger.error(f"[DB] Ошибка при получении пользователя топика {thread_id}: {e}")
+                return None
+        if user_id is None:
             logger.warning(f"[ThreadORM] Thread не найден для thread_id={thread_id}")
-        return thread.user_id if thread else None
+        return user_id
+
+    @staticmethod
+    async def get_thread_id(user_id: int, session: Optional[AsyncSession] = None) -> Optional[int]:
+        """
+        Получает thread_id топика пользователя
+        :param user_id: ID пользователя
+        :return: thread_id или None
+        """
+        async with read_session_scope(session) as session:
+            try:
+                query = select(UserThread.thread_id).filter(UserThread.user_id == user_id)
+                return (await session.execute(query)).scalar_one_or_none()
+            except Exception as e:
+                logger.error(f"[DB] Ошибка при получении топика пользователя {user_id}: {e}")
+                return None
+
+    @staticmethod
+    async def get_recent_threads(limit: int, session: Optional[AsyncSession] = None) -> list[tuple[int, int]]:
+        """
+        Последние созданные топики
+        :param limit: Сколько топиков вернуть
+        :return: Список (user_id, thread_id), самые свежие первыми
+        """
+        async with read_session_scope(session) as session:
+            try:
+                query = select(UserThread.user_id, UserThread.thread_id).order_by(UserThread.id.desc()).limit(limit)
+                return [tuple(row) for row in (await session.execute(query)).all()]
+            except Exception as e:
+                logger.error(f"[DB] Ошибка при получении топиков: {e}")
+                return []
+
+    @staticmethod
+    async def delete_thread(user_id: int, thread_id: int, session: Optional[AsyncSession] = None) -> bool:
+        """
+        Удаляет топик пользователя (например, если топик удалили в группе).
+        Запись удаляется, только если у пользователя всё ещё этот топик: устаревший
+        thread_id из кэша другого процесса не удалит уже созданный новый топик
+        :param user_id: ID пользователя
+        :param thread_id: ID пропавшего топика
+        :return: True — запись удалена
+        """
+        async with session_scope(session) as session:
+            try:
+                result = await session.execute(
+                    delete(UserThread).where(UserThread.user_id == user_id, UserThread.thread_id == thread_id)
+                )
+                await commit(session, immediate=True)
+                if not result.rowcount:
+                    return False
+                logger.info(f"[ThreadORM] Удалён топик {thread_id} пользователя {user_id}")
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при удалении топика пользователя {user_id}: {e}")
+                return False
+
+
+class SpareTopicORM:
+    """Класс для работы с пулом свободных топиков"""
+
+    @staticmethod
+    async def add_topic(thread_id: int, intro_message_id: int, session: Optional[AsyncSession] = None) -> bool:
+        """
+        Добавляет созданный свободный топик в пул
+        :param thread_id: ID топика
+        :param intro_message_id: ID сообщения-заглушки в топике
+        """
+        async with session_scope(session) as session:
+            try:
+                session.add(SpareTopic(thread_id=thread_id, intro_message_id=intro_message_id))
+                await commit(session, immediate=True)
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при добавлении свободного топика {thread_id}: {e}")
+                return False
+
+    @staticmethod
+    async def take_topic(session: Optional[AsyncSession] = None) -> Optional[tuple[int, int]]:
+        """
+        Забирает из пула самый старый свободный топик.
+        Параллельные вызовы не ждут друг друга и не получают один топик (SKIP LOCKED)
+        :return: (thread_id, intro_message_id) или None, если пул пуст
+        """
+        async with session_scope(session) as session:
+            try:
+                oldest = (
+                    select(SpareTopic.id)
+                    .order_by(SpareTopic.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                    .scalar_subquery()
+                )
+                query = (
+                    delete(SpareTopic)
+                    .where(SpareTopic.id == oldest)
+                    .returning(SpareTopic.thread_id, SpareTopic.intro_message_id)
+                )
+                row = (await session.execute(query)).first()
+                # Фиксируем сразу: откат апдейта не должен вернуть в пул уже выданный топик
+                await commit(session, immediate=True)
+                return tuple(row) if row else None
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при выдаче свободного топика: {e}")
+                return None
+
+    @staticmethod
+    async def count_topics(session: Optional[AsyncSession] = None) -> Optional[int]:
+        """Сколько свободных топиков в пуле (None — не удалось посчитать)"""
+        async with session_scope(session) as session:
+            try:
+                return (await session.execute(select(func.count()).select_from(SpareTopic))).scalar_one()
+            except Exception as e:
+                logger.error(f"[DB] Ошибка при подсчёте свободных топиков: {e}")
+                return None
+
+
+class PostRecord:
+    """
+    Лёгкая запись поста из выбранных колонок — без ORM-состояния и identity map.
+    Невыбранные колонки равны None.
+    """
+    __slots__ = ("id", "user_id", "post_id", "post_message_ids", "date_published", "created_at", "next_check_at")
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def __repr__(self):
+        return f"PostRecord(id={self.id}, post_id={self.post_id})"
+
+
+# Пересчёт счётчиков постов пользователей; меняет только строки, где они разошлись
+REBUILD_POST_COUNTERS_SQL = text("""
+    UPDATE users AS u SET
+        total_posts = s.total_posts,
+        active_posts = s.active_posts,
+        deleted_posts = s.deleted_posts,
+        last_published_at = s.last_published_at
+    FROM (
+        SELECT
+            users.user_id,
+            count(p.id) AS total_posts,
+            count(p.id) FILTER (WHERE p.is_published AND NOT p.is_deleted) AS active_posts,
+            count(p.id) FILTER (WHERE p.is_deleted) AS deleted_posts,
+            max(p.date_published) AS last_published_at
+        FROM users
+        LEFT JOIN user_posts AS p ON p.user_id = users.user_id
+        GROUP BY users.user_id
+    ) AS s
+    WHERE u.user_id = s.user_id
+      AND (u.total_posts, u.active_posts, u.deleted_posts, u.last_published_at)
+          IS DISTINCT FROM (s.total_posts, s.active_posts, s.deleted_posts, s.last_published_at)
+""")
+
+# Колонки, которых достаточно, чтобы найти пост в канале
+POST_REF_COLUMNS = ("id", "post_id", "post_message_ids")
 
 
 class PostsORM:
@@ -242,7 +663,8 @@ class PostsORM:
         post_media_list: list[str] = None,
         post_message_ids: list[int] = None,
         admin_id: int = None,
-        tariff_user: UserTariff = UserTariff.free
+        tariff_user: UserTariff = UserTariff.free,
+        session: Optional[AsyncSession] = None
     ) -> Optional[UserPosts]:
         """
         Создает новый пост в базе данных
@@ -259,7 +681,7 @@ class PostsORM:
         Returns:
             Объект UserPosts или None
         """
-        async with session_factory_async() as session:
+        async with session_scope(session) as session:
             try:
                 new_post = UserPosts(
                     user_id=user_id,
@@ -269,23 +691,36 @@ class PostsORM:
                     post_media_list=post_media_list,
                     is_published=True,
                     date_published=datetime.now(timezone.utc),
+                    # Первая проверка существования — через минимальный интервал
+                    next_check_at=datetime.now(timezone.utc) + timedelta(minutes=config.post_check.min_interval),
                     admin_id=admin_id,
                     tariff_user=tariff_user
                 )
                 session.add(new_post)
-                await session.commit()
+                await session.flush()
+                # Счётчики пользователя меняются в той же транзакции, что и пост
+                await session.execute(
+                    update(Users)
+                    .where(Users.user_id == user_id)
+                    .values(
+                        total_posts=Users.total_posts + 1,
+                        active_posts=Users.active_posts + 1,
+                        last_published_at=new_post.date_published
+                    )
+                )
+                await commit(session)
                 await session.refresh(new_post)
                 logger.info(f"Создан новый пост ID={new_post.id} для пользователя {user_id}")
                 return new_post
             except Exception as e:
-                await session.rollback()
+                await rollback(session)
                 logger.error(f"[DB] Ошибка при создании поста для пользователя {user_id}: {e}")
                 return None
     
     @staticmethod
-    async def get_post_by_id(post_id: int) -> Optional[UserPosts]:
+    async def get_post_by_id(post_id: int, session: Optional[AsyncSession] = None) -> Optional[UserPosts]:
         """Получает пост по ID"""
-        async with session_factory_async() as session:
+        async with read_session_scope(session) as session:
             try:
                 query = select(UserPosts).filter(UserPosts.id == post_id)
                 result = await session.execute(query)
@@ -295,9 +730,9 @@ class PostsORM:
                 return None
     
     @staticmethod
-    async def get_user_posts(user_id: int) -> list[UserPosts]:
+    async def get_user_posts(user_id: int, session: Optional[AsyncSession] = None) -> list[UserPosts]:
         """Получает все посты пользователя"""
-        async with session_factory_async() as session:
+        async with read_session_scope(session) as session:
             try:
                 query = select(UserPosts).filter(UserPosts.user_id == user_id).order_by(UserPosts.created_at.desc())
                 result = await session.execute(query)
@@ -307,9 +742,9 @@ class PostsORM:
                 return []
     
     @staticmethod
-    async def get_active_posts() -> list[UserPosts]:
+    async def get_active_posts(session: Optional[AsyncSession] = None) -> list[UserPosts]:
         """Получает все активные (не удалённые) опубликованные посты"""
-        async with session_factory_async() as session:
+        async with read_session_scope(session) as session:
             try:
                 query = select(UserPosts).filter(
                     UserPosts.is_published == True,
@@ -322,49 +757,304 @@ class PostsORM:
                 return []
     
     @staticmethod
-    async def mark_as_deleted(post_db_id: int) -> bool:
+    async def _iter_keyset(
+        conditions: list,
+        order_column,
+        columns: tuple[str, ...],
+        page_size: int,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[PostRecord]:
+        """
+        Постраничный обход постов по возрастанию ключа (order_column, id).
+        Каждая страница — отдельный короткий запрос, поэтому память и время
+        удержания соединения не зависят от общего числа постов.
+        """
+        unknown = set(columns) - set(PostRecord.__slots__)
+        if unknown:
+            raise ValueError(f"Колонки {', '.join(sorted(unknown))} нельзя выбрать в PostRecord")
+
+        # Колонки ключа нужны для курсора, даже если их не просили
+        names = list(dict.fromkeys([*columns, order_column.key, "id"]))
+        selected = [getattr(UserPosts, name) for name in names]
+        key = tuple_(order_column, UserPosts.id)
+
+        last = None
+        fetched = 0
+        while limit is None or fetched < limit:
+            size = page_size if limit is None else min(page_size, limit - fetched)
+            query = select(*selected).filter(order_column.is_not(None), *conditions)
+            if last is not None:
+                query = query.filter(key > last)
+            query = query.order_by(order_column, UserPosts.id).limit(size)
+
+            async with read_session() as session:
+                rows = (await session.execute(query)).all()
+
+            for row in rows:
+                yield PostRecord(**row._mapping)
+
+            fetched += len(rows)
+            if len(rows) < size:
+                return
+            last = (getattr(rows[-1], order_column.key), rows[-1].id)
+
+    @staticmethod
+    async def iter_due_posts(
+        limit: Optional[int] = None,
+        columns: tuple[str, ...] = POST_REF_COLUMNS,
+        page_size: int = 1000
+    ) -> AsyncIterator[PostRecord]:
+        """
+        Активные посты, которым пора проверить существование в канале, самые просроченные первыми
+
+        Args:
+            limit: Сколько постов отдать максимум
+            columns: Какие колонки выбрать в PostRecord
+            page_size: Размер страницы
+        """
+        # Срок фиксируется на старте обхода — перепланированные по ходу посты не вернутся
+        due_before = datetime.now(timezone.utc)
+        conditions = [
+            UserPosts.is_published == True,
+            UserPosts.is_deleted == False,
+            UserPosts.next_check_at <= due_before,
+        ]
+        async for post in PostsORM._iter_keyset(
+            conditions, UserPosts.next_check_at, columns, page_size, limit=limit
+        ):
+            yield post
+
+    @staticmethod
+    async def schedule_checks(schedule: list[dict], session: Optional[AsyncSession] = None) -> bool:
+        """
+        Сохраняет время проверки постов одним bulk UPDATE по первичному ключу
+        :param schedule: Список {"id", "last_checked_at", "next_check_at"}
+        """
+        if not schedule:
+            return True
+        async with session_scope(session) as session:
+            try:
+                await session.execute(update(UserPosts), schedule)
+                await commit(session)
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при сохранении расписания проверки постов: {e}")
+                return False
+
+    @staticmethod
+    def _mark_deleted_query(condition):
+        """
+        Один запрос: помечает посты удалёнными и переносит их из active_posts
+        в deleted_posts пользователей. Уже удалённые посты не трогает,
+        поэтому повторная пометка не сбивает счётчики. Возвращает число помеченных постов.
+        """
+        deleted = (
+            update(UserPosts)
+            .where(condition, UserPosts.is_deleted == False)
+            # updated_at задаётся явно: onupdate-параметры двух UPDATE в одном запросе конфликтуют по имени
+            .values(is_deleted=True, date_deleted=datetime.now(timezone.utc), updated_at=func.now())
+            .returning(UserPosts.user_id)
+            .cte("deleted")
+        )
+        per_user = (
+            select(deleted.c.user_id, func.count().label("n"))
+            .group_by(deleted.c.user_id)
+            .cte("per_user")
+        )
+        counters = (
+            update(Users)
+            .where(Users.user_id == per_user.c.user_id)
+            .values(
+                active_posts=Users.active_posts - per_user.c.n,
+                deleted_posts=Users.deleted_posts + per_user.c.n,
+                updated_at=func.now()
+            )
+            .returning(Users.user_id)
+            .cte("counters")
+        )
+        return select(func.coalesce(func.sum(per_user.c.n), 0)).add_cte(counters)
+
+    @staticmethod
+    async def mark_as_deleted(post_db_id: int, session: Optional[AsyncSession] = None) -> bool:
         """Помечает пост как удалённый в Telegram"""
-        async with session_factory_async() as session:
+        async with session_scope(session) as session:
             try:
-                query = (
-                    update(UserPosts)
-                    .where(UserPosts.id == post_db_id)
-                    .values(
-                        is_deleted=True,
-                        date_deleted=datetime.now(timezone.utc)
-                    )
-                )
-                await session.execute(query)
-                await session.commit()
+                await session.execute(PostsORM._mark_deleted_query(UserPosts.id == post_db_id))
+                await commit(session)
                 logger.info(f"[DB] Пост ID={post_db_id} помечен как удалённый")
                 return True
             except Exception as e:
-                await session.rollback()
+                await rollback(session)
                 logger.error(f"[DB] Ошибка при пометке поста {post_db_id} как удалённого: {e}")
                 return False
     
     @staticmethod
-    async def mark_posts_as_deleted(post_db_ids: list[int]) -> int:
+    async def mark_posts_as_deleted(post_db_ids: list[int], session: Optional[AsyncSession] = None) -> int:
         """Помечает несколько постов как удалённые. Возвращает количество обновлённых."""
         if not post_db_ids:
             return 0
-        async with session_factory_async() as session:
+        async with session_scope(session) as session:
             try:
-                query = (
-                    update(UserPosts)
-                    .where(UserPosts.id.in_(post_db_ids))
-                    .values(
-                        is_deleted=True,
-                        date_deleted=datetime.now(timezone.utc)
-                    )
-                )
-                result = await session.execute(query)
-                await session.commit()
-                count = result.rowcount
+                result = await session.execute(PostsORM._mark_deleted_query(UserPosts.id.in_(post_db_ids)))
+                await commit(session)
+                count = result.scalar_one()
                 logger.info(f"[DB] Помечено как удалённые: {count} постов")
                 return count
             except Exception as e:
-                await session.rollback()
+                await rollback(session)
                 logger.error(f"[DB] Ошибка при пометке постов как удалённых: {e}")
                 return 0
 
+    @staticmethod
+    async def rebuild_post_counters(session: Optional[AsyncSession] = None) -> int:
+        """
+        Пересчитывает счётчики постов всех пользователей по user_posts.
+        Исправляет только разошедшиеся строки. Возвращает их количество.
+        """
+        async with session_scope(session) as session:
+            try:
+                result = await session.execute(REBUILD_POST_COUNTERS_SQL)
+                await commit(session)
+                return result.rowcount
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при пересчёте счётчиков постов: {e}")
+                return 0
+
+
+class BroadcastORM:
+    """Класс для работы с задачами рассылок"""
+
+    @staticmethod
+    async def create_job(
+        admin_id: int,
+        recipient_type: str,
+        recipient_ids: list[int],
+        payload: dict,
+        total: int,
+        status_chat_id: int = None,
+        status_message_id: int = None,
+        session: Optional[AsyncSession] = None
+    ) -> Optional[BroadcastJob]:
+        """Создаёт задачу рассылки"""
+        async with session_scope(session) as session:
+            try:
+                job = BroadcastJob(
+                    admin_id=admin_id,
+                    recipient_type=recipient_type,
+                    recipient_ids=recipient_ids,
+                    payload=payload,
+                    status=BroadcastStatus.running,
+                    cursor=0,
+                    total=total,
+                    success_count=0,
+                    failed_count=0,
+                    status_chat_id=status_chat_id,
+                    status_message_id=status_message_id
+                )
+                session.add(job)
+                await commit(session, immediate=True)
+                await session.refresh(job)
+                logger.info(f"[DB] Создана задача рассылки ID={job.id}, получателей: {total}")
+                return job
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при создании задачи рассылки: {e}")
+                return None
+
+    @staticmethod
+    async def get_running_jobs(session: Optional[AsyncSession] = None) -> list[BroadcastJob]:
+        """Получает незавершённые рассылки (для возобновления после рестарта)"""
+        async with session_scope(session) as session:
+            try:
+                query = select(BroadcastJob).filter(
+                    BroadcastJob.status == BroadcastStatus.running
+                ).order_by(BroadcastJob.id)
+                result = await session.execute(query)
+                return result.scalars().all()
+            except Exception as e:
+                logger.error(f"[DB] Ошибка при получении активных рассылок: {e}")
+                return []
+
+    @staticmethod
+    async def save_progress(
+        job_id: int,
+        deliveries: list[dict],
+        cursor: int,
+        session: Optional[AsyncSession] = None
+    ) -> bool:
+        """
+        Записывает пачку результатов доставки и сдвигает курсор в одной транзакции
+
+        Args:
+            job_id: ID задачи рассылки
+            deliveries: Список {"user_id", "is_sent", "error"}
+            cursor: Новый курсор задачи
+        """
+        async with session_scope(session) as session:
+            try:
+                success = 0
+                failed = 0
+                if deliveries:
+                    query = (
+                        pg_insert(BroadcastDelivery)
+                        .values([{**delivery, "job_id": job_id} for delivery in deliveries])
+                        .on_conflict_do_nothing(index_elements=['job_id', 'user_id'])
+                        .returning(BroadcastDelivery.is_sent)
+                    )
+                    result = await session.execute(query)
+                    # Считаем только реально вставленные строки (повторы после рестарта пропускаются)
+                    for is_sent in result.scalars().all():
+                        if is_sent:
+                            success += 1
+                        else:
+                            failed += 1
+
+                query = (
+                    update(BroadcastJob)
+                    .where(BroadcastJob.id == job_id)
+                    .values(
+                        cursor=func.greatest(BroadcastJob.cursor, cursor),
+                        success_count=BroadcastJob.success_count + success,
+                        failed_count=BroadcastJob.failed_count + failed
+                    )
+                )
+                await session.execute(query)
+                await commit(session)
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при сохранении прогресса рассылки {job_id}: {e}")
+                return False
+
+    @staticmethod
+    async def get_job(job_id: int, session: Optional[AsyncSession] = None) -> Optional[BroadcastJob]:
+        """Получает задачу рассылки по ID"""
+        async with session_scope(session) as session:
+            query = select(BroadcastJob).filter(BroadcastJob.id == job_id)
+            result = await session.execute(query)
+            return result.scalar_one_or_none()
+
+    @staticmethod
+    async def finish_job(
+        job_id: int,
+        status: BroadcastStatus = BroadcastStatus.done,
+        session: Optional[AsyncSession] = None
+    ) -> bool:
+        """Помечает задачу рассылки завершённой"""
+        async with session_scope(session) as session:
+            try:
+                query = (
+                    update(BroadcastJob)
+                    .where(BroadcastJob.id == job_id)
+                    .values(status=status, finished_at=datetime.now(timezone.utc))
+                )
+                await session.execute(query)
+                await commit(session)
+                logger.info(f"[DB] Рассылка ID={job_id} завершена со статусом {status.value}")
+                return True
+            except Exception as e:
+                await rollback(session)
+                logger.error(f"[DB] Ошибка при завершении рассылки {job_id}: {e}")
+                return False
@@ -5,7 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from db.models import Base, Logger, Users, UserPosts, UserThread
+from db.models import Base, Logger, Users, UserPosts, UserThread, BroadcastJob, BroadcastDelivery, SpareTopic
 from config_data import config as config_env
 
 config = context.config
@@ -0,0 +1,29 @@
+"""add_last_delivery_at_to_users
+
+Revision ID: 5e1f0c2b9d47
+Revises: a77cb9b5d8f0
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1f0c2b9d47'
+down_revision: Union[str, None] = 'a77cb9b5d8f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Время последней успешной доставки сообщения от бота пользователю
+    op.add_column('users', sa.Column('last_delivery_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'last_delivery_at')
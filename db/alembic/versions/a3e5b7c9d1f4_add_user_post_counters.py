@@ -0,0 +1,57 @@
+"""add_user_post_counters
+
+Revision ID: a3e5b7c9d1f4
+Revises: f2c8d4a6b9e3
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e5b7c9d1f4'
+down_revision: Union[str, None] = 'f2c8d4a6b9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('active_posts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('deleted_posts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('last_published_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Заполняем счётчики по существующим постам
+    op.execute("""
+        UPDATE users AS u SET
+            total_posts = s.total_posts,
+            active_posts = s.active_posts,
+            deleted_posts = s.deleted_posts,
+            last_published_at = s.last_published_at
+        FROM (
+            SELECT
+                users.user_id,
+                count(p.id) AS total_posts,
+                count(p.id) FILTER (WHERE p.is_published AND NOT p.is_deleted) AS active_posts,
+                count(p.id) FILTER (WHERE p.is_deleted) AS deleted_posts,
+                max(p.date_published) AS last_published_at
+            FROM users
+            LEFT JOIN user_posts AS p ON p.user_id = users.user_id
+            GROUP BY users.user_id
+        ) AS s
+        WHERE u.user_id = s.user_id
+    """)
+
+    # После заполнения total_posts не бывает NULL — счётчики увеличиваются выражением total_posts + 1
+    op.alter_column('users', 'total_posts', existing_type=sa.Integer(), server_default='0', nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('users', 'total_posts', existing_type=sa.Integer(), server_default=None, nullable=True)
+    op.drop_column('users', 'last_published_at')
+    op.drop_column('users', 'deleted_posts')
+    op.drop_column('users', 'active_posts')
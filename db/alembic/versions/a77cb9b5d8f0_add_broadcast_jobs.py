@@ -0,0 +1,58 @@
+"""add_broadcast_jobs
+
+Revision ID: a77cb9b5d8f0
+Revises: 4806cd9f4f56
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a77cb9b5d8f0'
+down_revision: Union[str, None] = '4806cd9f4f56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Задачи рассылок и результаты доставки по получателям — для возобновления после рестарта
+    op.create_table('broadcast_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('admin_id', sa.BigInteger(), nullable=True),
+    sa.Column('recipient_type', sa.String(), nullable=True),
+    sa.Column('recipient_ids', postgresql.ARRAY(sa.BigInteger()), nullable=True),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('status', sa.Enum('running', 'done', 'failed', name='broadcaststatus'), nullable=True),
+    sa.Column('cursor', sa.BigInteger(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('success_count', sa.Integer(), nullable=True),
+    sa.Column('failed_count', sa.Integer(), nullable=True),
+    sa.Column('status_chat_id', sa.BigInteger(), nullable=True),
+    sa.Column('status_message_id', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('broadcast_deliveries',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('is_sent', sa.Boolean(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['broadcast_jobs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('job_id', 'user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('broadcast_deliveries')
+    op.drop_table('broadcast_jobs')
+    op.execute("DROP TYPE IF EXISTS broadcaststatus")
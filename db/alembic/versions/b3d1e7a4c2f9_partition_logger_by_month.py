@@ -0,0 +1,104 @@
+"""partition_logger_by_month
+
+Revision ID: b3d1e7a4c2f9
+Revises: 5e1f0c2b9d47
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d1e7a4c2f9'
+down_revision: Union[str, None] = '5e1f0c2b9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько месяцев вперёд создавать партиции сразу
+MONTHS_AHEAD = 2
+
+
+def month_start(value: datetime, shift: int = 0) -> datetime:
+    """Начало месяца со сдвигом на shift месяцев"""
+    index = value.year * 12 + value.month - 1 + shift
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # logger становится секционированной по месяцам таблицей:
+    # старые логи удаляются DROP партиции, а не DELETE
+    op.execute("ALTER TABLE logger RENAME TO logger_old")
+    op.execute("ALTER TABLE logger_old RENAME CONSTRAINT logger_pkey TO logger_old_pkey")
+    op.execute("ALTER TABLE logger_old ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE logger_id_seq OWNED BY NONE")
+
+    # В ключ секционированной таблицы обязан входить ключ секционирования
+    op.execute("""
+        CREATE TABLE logger (
+            id integer NOT NULL DEFAULT nextval('logger_id_seq'),
+            timestamp timestamp with time zone NOT NULL DEFAULT now(),
+            user_id bigint,
+            user_name varchar,
+            type varchar,
+            action varchar,
+            CONSTRAINT logger_pkey PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE logger_id_seq OWNED BY logger.id")
+
+    bind = op.get_bind()
+    now = datetime.now(timezone.utc)
+    oldest = bind.execute(sa.text("SELECT min(timestamp) FROM logger_old")).scalar() or now
+    start = month_start(oldest)
+    end = month_start(now, MONTHS_AHEAD + 1)
+    while start < end:
+        upper = month_start(start, 1)
+        op.execute(
+            f"CREATE TABLE logger_y{start:%Y}m{start:%m} PARTITION OF logger "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        start = upper
+    # Страховка на случай, если job не успел создать партицию на новый месяц
+    op.execute("CREATE TABLE logger_default PARTITION OF logger DEFAULT")
+
+    op.execute("""
+        INSERT INTO logger (id, timestamp, user_id, user_name, type, action)
+        SELECT id, coalesce(timestamp, now()), user_id, user_name, type, action FROM logger_old
+    """)
+    op.execute("DROP TABLE logger_old")
+
+    # Индексы на секционированной таблице создаются во всех партициях, в том числе будущих
+    op.execute("CREATE INDEX ix_logger_timestamp_brin ON logger USING brin (timestamp)")
+    op.create_index('ix_logger_user_id', 'logger', ['user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE logger RENAME TO logger_partitioned")
+    op.execute("ALTER TABLE logger_partitioned RENAME CONSTRAINT logger_pkey TO logger_partitioned_pkey")
+    op.execute("ALTER TABLE logger_partitioned ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE logger_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE logger (
+            id integer NOT NULL DEFAULT nextval('logger_id_seq'),
+            timestamp timestamp with time zone,
+            user_id bigint,
+            user_name varchar,
+            type varchar,
+            action varchar,
+            CONSTRAINT logger_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE logger_id_seq OWNED BY logger.id")
+    op.execute("""
+        INSERT INTO logger (id, timestamp, user_id, user_name, type, action)
+        SELECT id, timestamp, user_id, user_name, type, action FROM logger_partitioned
+    """)
+    # Партиции удаляются вместе с родительской таблицей
+    op.execute("DROP TABLE logger_partitioned")
@@ -0,0 +1,32 @@
+"""schedule_unchecked_posts
+
+Revision ID: c5e9a1d3f7b2
+Revises: b8d2f4a6c1e7
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9a1d3f7b2'
+down_revision: Union[str, None] = 'b8d2f4a6c1e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Посты, опубликованные из админки без расписания, проверяются при ближайшем запуске
+    op.execute(
+        "UPDATE user_posts SET next_check_at = now() "
+        "WHERE is_published AND NOT is_deleted AND next_check_at IS NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Данные не откатываются: расписание проверки для таких постов остаётся корректным
+    pass
@@ -0,0 +1,41 @@
+"""add_post_check_schedule
+
+Revision ID: d41f6a2e8b10
+Revises: b3d1e7a4c2f9
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f6a2e8b10'
+down_revision: Union[str, None] = 'b3d1e7a4c2f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Расписание проверки существования поста в канале
+    op.add_column('user_posts', sa.Column('next_check_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('user_posts', sa.Column('last_checked_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Существующие активные посты проверяются при ближайшем запуске, дальше — по возрасту
+    op.execute("UPDATE user_posts SET next_check_at = now() WHERE is_published AND NOT is_deleted")
+
+    # Очередь проверки: только активные посты, по времени следующей проверки
+    op.create_index(
+        'ix_user_posts_next_check_at', 'user_posts', ['next_check_at'],
+        postgresql_where=sa.text('is_published AND NOT is_deleted')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_posts_next_check_at', table_name='user_posts')
+    op.drop_column('user_posts', 'last_checked_at')
+    op.drop_column('user_posts', 'next_check_at')
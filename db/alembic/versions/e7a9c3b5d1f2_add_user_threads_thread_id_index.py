@@ -0,0 +1,28 @@
+"""add_user_threads_thread_id_index
+
+Revision ID: e7a9c3b5d1f2
+Revises: d41f6a2e8b10
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a9c3b5d1f2'
+down_revision: Union[str, None] = 'd41f6a2e8b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Поиск пользователя по топику при каждом ответе админа
+    op.create_index(op.f('ix_user_threads_thread_id'), 'user_threads', ['thread_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_threads_thread_id'), table_name='user_threads')
@@ -0,0 +1,50 @@
+"""add_user_posts_indexes
+
+Revision ID: f2c8d4a6b9e3
+Revises: e7a9c3b5d1f2
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8d4a6b9e3'
+down_revision: Union[str, None] = 'e7a9c3b5d1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в user_posts, но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        # Активные посты по дате публикации
+        op.create_index(
+            'ix_user_posts_active_date_published', 'user_posts', ['date_published'],
+            postgresql_where=sa.text('is_published AND NOT is_deleted'),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        # Посты пользователя, новые первыми
+        op.create_index(
+            'ix_user_posts_user_id_created_at', 'user_posts', ['user_id', sa.text('created_at DESC')],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_user_posts_user_id_created_at', table_name='user_posts',
+            postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            'ix_user_posts_active_date_published', table_name='user_posts',
+            postgresql_concurrently=True, if_exists=True
+        )
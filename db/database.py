@@ -1,16 +1,242 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from sqlalchemy import create_engine, make_url
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from config_data.config import DATABASE_URL_psycorg, DATABASE_URL_asyncpg
+from app.service.metrics import Counter, Gauge, Histogram
+from config_data.config import ConfigEnv, load_config, DATABASE_URL_psycorg, DATABASE_URL_asyncpg
 
-# Синхронный движок и сессия
-engine = create_engine(DATABASE_URL_psycorg(), echo=False)
-session_factory = sessionmaker(bind=engine)
+config: ConfigEnv = load_config()
 
-# асинхронный движок и сессия
-async_engine = create_async_engine(
-    url=DATABASE_URL_asyncpg(),
-    echo=False
+
+@lru_cache(maxsize=None)
+def get_sync_engine():
+    """Синхронный движок: создаётся при первом обращении, бот им не пользуется"""
+    return create_engine(DATABASE_URL_psycorg(), echo=False)
+
+
+@lru_cache(maxsize=None)
+def get_sync_session_factory() -> sessionmaker:
+    return sessionmaker(bind=get_sync_engine())
+
+
+def __getattr__(name):
+    # Синхронные engine и session_factory ленивые: psycopg импортируется только по требованию
+    if name == "engine":
+        return get_sync_engine()
+    if name == "session_factory":
+        return get_sync_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Время получения соединения из пула (ожидание + открытие нового)",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
 )
+pool_checkout_timeouts = Counter("db_pool_checkout_timeouts_total", "Таймауты ожидания соединения из пула")
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, который замеряет время выдачи соединения и считает таймауты"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except sa_exc.TimeoutError:
+            pool_checkout_timeouts.inc()
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started)
+
+
+connect_args = {}
+if config.db_pool.pgbouncer:
+    # PgBouncer в режиме transaction pooling не держит prepared statements между транзакциями:
+    # отключаем кэши asyncpg и SQLAlchemy, имена statements делаем уникальными
+    connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+def create_pooled_engine(url):
+    """Асинхронный движок с общими настройками пула"""
+    return create_async_engine(
+        url=url,
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=config.db_pool.size,
+        max_overflow=config.db_pool.max_overflow,
+        pool_timeout=config.db_pool.timeout,
+        pool_recycle=config.db_pool.recycle,
+        connect_args=connect_args,
+    )
+
+
+# асинхронный движок и сессия
+async_engine = create_pooled_engine(DATABASE_URL_asyncpg())
+
+Gauge("db_pool_size", "Постоянный размер пула соединений", lambda: async_engine.pool.size())
+Gauge("db_pool_checked_out", "Соединения, выданные из пула", lambda: async_engine.pool.checkedout())
+Gauge("db_pool_checked_in", "Свободные соединения в пуле", lambda: async_engine.pool.checkedin())
+Gauge("db_pool_overflow", "Соединения сверх pool_size", lambda: max(async_engine.pool.overflow(), 0))
 session_factory_async = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# Реплика для чтения (необязательно). Без неё все чтения идут на primary
+replica_engine = None
+replica_session_factory_async = None
+if config.postgres.replica_url:
+    replica_engine = create_pooled_engine(make_url(config.postgres.replica_url).set(drivername="postgresql+asyncpg"))
+    replica_session_factory_async = async_sessionmaker(replica_engine, expire_on_commit=False)
+    Gauge("db_replica_pool_checked_out", "Соединения, выданные из пула реплики",
+          lambda: replica_engine.pool.checkedout())
+
+# Сессия текущего апдейта (unit of work), её открывает DbSessionMiddleware
+current_session: ContextVar[Optional[AsyncSession]] = ContextVar("current_session", default=None)
+# Пользователь текущего апдейта — для read-your-writes
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+# user_id -> момент (monotonic), до которого его данные читаются с primary
+_recent_writes: dict[int, float] = {}
+
+
+def mark_user_write(user_id: Optional[int]):
+    """Запоминает запись от пользователя: его чтения какое-то время пойдут на primary"""
+    if user_id is None or replica_engine is None:
+        return
+    now = time.monotonic()
+    if len(_recent_writes) > 10_000:
+        for key, until in list(_recent_writes.items()):
+            if until <= now:
+                del _recent_writes[key]
+    _recent_writes[user_id] = now + config.postgres.read_your_writes
+
+
+def must_read_primary() -> bool:
+    """Чтение должно видеть свежие записи: в апдейте уже писали или пользователь недавно писал"""
+    session = current_session.get()
+    if session is not None and session.info.get("has_writes"):
+        return True
+    until = _recent_writes.get(current_user_id.get())
+    return until is not None and until > time.monotonic()
+
+
+def use_replica() -> bool:
+    """Читать ли с реплики: она настроена и свежие записи не нужны"""
+    return replica_session_factory_async is not None and not must_read_primary()
+
+
+def read_session() -> AsyncSession:
+    """Новая сессия для чтения: на реплике или, если она не подходит, на primary"""
+    if use_replica():
+        return replica_session_factory_async()
+    return session_factory_async()
+
+
+@asynccontextmanager
+async def session_scope(session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Сессия для ORM-метода: переданная явно, сессия текущего апдейта или новая.
+    Чужую сессию не закрываем — ею управляет тот, кто её открыл.
+    В unit of work апдейта метод работает в своём SAVEPOINT: ошибка метода (и его rollback)
+    откатывает только его изменения, а не записанное раньше в том же апдейте.
+    """
+    if session is None:
+        session = current_session.get()
+    if session is None:
+        async with session_factory_async() as session:
+            yield session
+        return
+    if not session.info.get("unit_of_work"):
+        yield session
+        return
+
+    savepoints = session.info.setdefault("savepoints", [])
+    savepoint = await session.begin_nested()
+    savepoints.append(savepoint)
+    try:
+        yield session
+    except BaseException:
+        if savepoint.is_active:
+            await savepoint.rollback()
+        raise
+    else:
+        # Неактивен, если метод уже откатил SAVEPOINT или зафиксировал транзакцию (immediate)
+        if savepoint.is_active:
+            await savepoint.commit()
+    finally:
+        savepoints.remove(savepoint)
+
+
+@asynccontextmanager
+async def read_session_scope(session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Сессия для ORM-метода, который только читает и терпит отставание реплики.
+    Переданная явно сессия используется как есть; иначе — короткая сессия реплики,
+    а если реплики нет или нужны свежие записи — как в session_scope.
+    """
+    if session is not None or not use_replica():
+        async with session_scope(session) as session:
+            yield session
+        return
+    async with replica_session_factory_async() as session:
+        yield session
+
+
+async def rollback(session: AsyncSession):
+    """
+    Откатывает изменения ORM-метода после ошибки.
+    В unit of work апдейта — только SAVEPOINT метода, остальные записи апдейта сохраняются.
+    """
+    savepoints = session.info.get("savepoints")
+    if savepoints and savepoints[-1].is_active:
+        await savepoints[-1].rollback()
+    else:
+        await session.rollback()
+
+
+async def release_session():
+    """
+    Фиксирует unit of work текущего апдейта перед долгим внешним вызовом (Telegram, OpenAI, S3),
+    чтобы соединение вернулось в пул, а не ждало ответа сети внутри открытой транзакции.
+    Следующий запрос к БД в этом апдейте начнёт новую транзакцию.
+    """
+    session = current_session.get()
+    if session is None or not session.in_transaction() or session.info.get("savepoints"):
+        return
+    # Внешние вызовы апдейта могут идти параллельно (asyncio.gather) — фиксируем один раз
+    lock = session.info.setdefault("release_lock", asyncio.Lock())
+    async with lock:
+        if not session.in_transaction():
+            return
+        await session.commit()
+        if session.info.get("has_writes"):
+            mark_user_write(current_user_id.get())
+
+
+async def commit(session: AsyncSession, immediate: bool = False):
+    """
+    Фиксирует изменения ORM-метода.
+    Внутри unit of work апдейта только flush — commit сделает middleware в конце апдейта.
+    immediate=True фиксирует сразу: изменения должны быть видны другим соединениям
+    (фоновым задачам, параллельным апдейтам) ещё до конца обработки.
+    """
+    session.info["has_writes"] = True
+    if session.info.get("unit_of_work") and not immediate:
+        await session.flush()
+    else:
+        await session.commit()
+        mark_user_write(current_user_id.get())
+
@@ -1,6 +1,6 @@
 from datetime import datetime
 from sqlalchemy import Column, DateTime, Integer, String, BigInteger, ForeignKey, JSON, Boolean, Enum, Text, Table, \
-    UniqueConstraint, ARRAY
+    UniqueConstraint, ARRAY, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -23,6 +23,11 @@ class UserTariff(enum.Enum):
     pro = 'pro'
     premium = 'premium'
 
+class BroadcastStatus(enum.Enum):
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
 class Users(Base):
     """
     Модель пользователя в системе
@@ -42,9 +47,14 @@ class Users(Base):
 
     user_status = Column(Enum(UserStatus), default=UserStatus.active)
     user_tariff = Column(Enum(UserTariff), default=UserTariff.free)
+    last_delivery_at = Column(DateTime(timezone=True), nullable=True)  # Последняя успешная доставка от бота
 
 
-    total_posts = Column(Integer, default=0)
+    # Счётчики постов, их обновляют PostsORM.create_post и пометка удаления
+    total_posts = Column(Integer, default=0, server_default='0', nullable=False)
+    active_posts = Column(Integer, default=0, server_default='0', nullable=False)  # Опубликованы и не удалены
+    deleted_posts = Column(Integer, default=0, server_default='0', nullable=False)  # Удалены из канала
+    last_published_at = Column(DateTime(timezone=True), nullable=True)
 
     # заметки
     notes = Column(Text, nullable=True)
@@ -54,6 +64,16 @@ class UserPosts(Base):
     Модель для постов пользователя
     """
     __tablename__ = 'user_posts'
+    __table_args__ = (
+        # Активные посты по дате публикации
+        Index('ix_user_posts_active_date_published', 'date_published',
+              postgresql_where=text('is_published AND NOT is_deleted')),
+        # Посты пользователя, новые первыми
+        Index('ix_user_posts_user_id_created_at', 'user_id', text('created_at DESC')),
+        # Очередь проверки существования постов в канале
+        Index('ix_user_posts_next_check_at', 'next_check_at',
+              postgresql_where=text('is_published AND NOT is_deleted')),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger)
@@ -66,6 +86,8 @@ class UserPosts(Base):
     is_deleted = Column(Boolean, default=False)  # Удалён ли пост в Telegram
     date_published = Column(DateTime(timezone=True), nullable=True)
     date_deleted = Column(DateTime(timezone=True), nullable=True)  # Когда обнаружено удаление
+    next_check_at = Column(DateTime(timezone=True), nullable=True)  # Когда проверить существование поста
+    last_checked_at = Column(DateTime(timezone=True), nullable=True)  # Когда пост проверялся последний раз
     admin_id = Column(BigInteger, nullable=True)
     tariff_user = Column(Enum(UserTariff), default=UserTariff.free)
     
@@ -84,20 +106,76 @@ class UserThread(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(BigInteger, unique=True, index=True)
     user_name = Column(String, nullable=True)
-    thread_id = Column(Integer, nullable=False)
+    thread_id = Column(Integer, nullable=False, index=True)
     
     created_at = Column(DateTime(timezone=True), default=datetime.now)
     updated_at = Column(DateTime(timezone=True), onupdate=datetime.now, nullable=True)
 
+class SpareTopic(Base):
+    """
+    Заранее созданный свободный топик в группе модерации.
+    Новому пользователю отдаётся переименованием, без создания топика на его сообщении
+    """
+    __tablename__ = 'spare_topics'
+
+    id = Column(Integer, primary_key=True)
+    thread_id = Column(Integer, nullable=False, unique=True)
+    intro_message_id = Column(BigInteger, nullable=False)  # Заглушка, которая станет карточкой пользователя
+
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
+
 class Logger(Base):
     """
     Модель для логирования действий пользователей
     """
     __tablename__ = 'logger'
 
-    id = Column(Integer, primary_key=True)
-    timestamp = Column(DateTime(timezone=True), default=datetime.now)
+    # Таблица секционирована по месяцам timestamp — он входит в первичный ключ
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, default=datetime.now)
     user_id = Column(BigInteger)
     user_name = Column(String, nullable=True)
     type = Column(String)
     action = Column(String)
+
+
+class BroadcastJob(Base):
+    """
+    Модель задачи рассылки. Получатели обходятся по возрастанию user_id,
+    cursor — последний user_id, до которого включительно все доставки записаны.
+    """
+    __tablename__ = 'broadcast_jobs'
+
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(BigInteger)
+    recipient_type = Column(String)  # send_all / send_selected / exclude_ids
+    recipient_ids = Column(ARRAY(BigInteger), nullable=True)  # Выбранные или исключённые ID
+    payload = Column(JSONB)  # Содержимое сообщения рассылки
+    status = Column(Enum(BroadcastStatus), default=BroadcastStatus.running)
+
+    cursor = Column(BigInteger, default=0)
+    total = Column(Integer, default=0)
+    success_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+
+    # Сообщение админу, в котором обновляется прогресс
+    status_chat_id = Column(BigInteger, nullable=True)
+    status_message_id = Column(BigInteger, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
+    updated_at = Column(DateTime(timezone=True), onupdate=datetime.now, nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class BroadcastDelivery(Base):
+    """
+    Модель результата доставки рассылки одному получателю
+    """
+    __tablename__ = 'broadcast_deliveries'
+
+    job_id = Column(Integer, ForeignKey('broadcast_jobs.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    is_sent = Column(Boolean, default=False)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), default=datetime.now)
@@ -1,8 +1,6 @@
 import logging
 
-import boto3
-from botocore.client import Config
-from botocore.exceptions import ClientError, NoCredentialsError
+from functools import lru_cache
 from typing import Optional, BinaryIO
 from config_data.config import ConfigEnv, load_config
 
@@ -10,14 +8,22 @@ config: ConfigEnv = load_config()
 logger = logging.getLogger(__name__)
 
 
-# Конфигурация S3 клиента
-s3_client = boto3.client(
-    's3',
-    config=Config(signature_version='s3v4'),
-    endpoint_url=config.s3.url,
-    aws_access_key_id=config.s3.key_id,
-    aws_secret_access_key=config.s3.key_secret,
-)
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """
+    S3 клиент создаётся при первой загрузке или генерации ссылки:
+    boto3 импортируется долго, а на старте бота не нужен
+    """
+    import boto3
+    from botocore.client import Config
+
+    return boto3.client(
+        's3',
+        config=Config(signature_version='s3v4'),
+        endpoint_url=config.s3.url,
+        aws_access_key_id=config.s3.key_id,
+        aws_secret_access_key=config.s3.key_secret,
+    )
 
 
 async def upload_to_s3(
@@ -38,11 +44,13 @@ async def upload_to_s3(
     Returns:
         Ключ файла в S3 (file_name) если успешно, None в случае ошибки
     """
+    from botocore.exceptions import ClientError
+
     bucket_name = bucket_name or config.s3.name
 
     try:
         # Загружаем файл
-        s3_client.upload_fileobj(file_stream, bucket_name, file_name)
+        get_s3_client().upload_fileobj(file_stream, bucket_name, file_name)
         logger.info(f'✅ Файл {file_name} успешно загружен в S3')
 
         # Возвращаем КЛЮЧ файла, а не URL
@@ -72,7 +80,7 @@ async def get_presigned_url(key: str, expires_in: int = 3600) -> Optional[str]:
         Presigned URL или None
     """
     try:
-        url = s3_client.generate_presigned_url(
+        url = get_s3_client().generate_presigned_url(
             ClientMethod='get_object',
             Params={
                 'Bucket': config.s3.name,